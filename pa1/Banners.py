@@ -0,0 +1,142 @@
+import asyncio
+import queue
+import re
+import threading
+
+BANNER_BYTES = 256      #Most bytes read from any one port
+BANNER_TIMEOUT = 2.0    #Most seconds spent on any one port, connect included
+BANNER_WAIT = 0.5       #How long a silent server gets before it is sent PROBE
+BANNER_CONCURRENCY = 64 #Grabs in flight at once
+PROBE = b"HEAD / HTTP/1.0\r\n\r\n" #Servers that wait for the client to talk first are mostly HTTP
+
+#(pattern, service) pairs tried in order against the start of what a port sent back
+FINGERPRINTS = [
+    (re.compile(rb"^SSH-\d"), "ssh"),
+    (re.compile(rb"^HTTP/\d"), "http"),
+    (re.compile(rb"^220[ -].*(?i:ftp)"), "ftp"),
+    (re.compile(rb"^220[ -].*(?i:smtp|mail|esmtp)"), "smtp"),
+    (re.compile(rb"^220[ -]"), "ftp/smtp"),
+    (re.compile(rb"^\+OK"), "pop3"),
+    (re.compile(rb"^\* (?:OK|PREAUTH)"), "imap"),
+    (re.compile(rb"^-(?:ERR|NOAUTH)|^\+PONG"), "redis"),
+    (re.compile(rb"^.{3}\x00\x0a[0-9]", re.S), "mysql"),
+    (re.compile(rb"^\x15\x03[\x00-\x04]"), "tls"),
+    (re.compile(rb"^RFB \d{3}\.\d{3}"), "vnc"),
+]
+
+#Function to name the service behind a banner- None if nothing matches
+def fingerprint(data):
+    for pattern, service in FINGERPRINTS:
+        if pattern.match(data):
+            return service
+    return None
+
+#Function to turn a banner into one short printable line for the report
+def banner_text(data, width=80):
+    line = data.split(b"\n", 1)[0].rstrip(b"\r")
+    text = "".join(chr(b) if 32 <= b < 127 else "." for b in line)
+    return text[:width]
+
+#Function to connect to an open port and read what it says within the byte and time budget- sends PROBE if it stays quiet
+async def grab(ip, port, max_bytes=BANNER_BYTES, budget=BANNER_TIMEOUT):
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + budget
+    data = b""
+    writer = None
+    try:
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(ip, port, limit=max_bytes), budget)
+        probed = False
+        while len(data) < max_bytes and b"\n" not in data:
+            left = deadline - loop.time()
+            if left <= 0:
+                break
+            wait = left if probed else min(left, BANNER_WAIT)
+            try:
+                chunk = await asyncio.wait_for(reader.read(max_bytes - len(data)), wait)
+            except asyncio.TimeoutError:
+                if probed or data:
+                    break
+                writer.write(PROBE)
+                probed = True
+                continue
+            if not chunk:
+                break
+            data += chunk
+    except (OSError, asyncio.TimeoutError):
+        pass
+    finally:
+        if writer is not None:
+            writer.close()
+    return data[:max_bytes]
+
+#Wraps the scan callbacks with a banner-grab stage- every open port is handed to a pool of grabs running on their
+#own thread and event loop while the scan goes on, and its report is held back until the banner is in. A target's
+#on_done waits for its last banner, and everything still in flight is finished by drain()
+#on_open(idx, ip, port, latency, banner) and on_done(idx, open_ports, banners) get banner = (service, text) or None
+class BannerStage():
+    def __init__(self, on_open, on_done, max_bytes=BANNER_BYTES, budget=BANNER_TIMEOUT, concurrency=BANNER_CONCURRENCY):
+        self.outer_open = on_open
+        self.outer_done = on_done
+        self.max_bytes = max_bytes
+        self.budget = budget
+        self.results = queue.Queue() #Finished grabs, handed back to the scanning thread
+        self.targets = {} # idx -> [grabs still running, {port: banner}, open ports once the scan of it is done]
+        self.loop = asyncio.new_event_loop()
+        self.slots = None
+        self.concurrency = concurrency
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True, name="banners")
+        self.thread.start()
+
+    #Grab coroutine- runs on the banner thread
+    async def _grab(self, idx, ip, port, latency):
+        if self.slots is None:
+            self.slots = asyncio.Semaphore(self.concurrency)
+        async with self.slots:
+            data = await grab(ip, port, self.max_bytes, self.budget)
+        self.results.put((idx, ip, port, latency, data))
+
+    def on_open(self, idx, ip, port, latency):
+        state = self.targets.setdefault(idx, [0, {}, None])
+        state[0] += 1
+        asyncio.run_coroutine_threadsafe(self._grab(idx, ip, port, latency), self.loop)
+        self._collect(False)
+
+    def on_done(self, idx, open_ports):
+        state = self.targets.setdefault(idx, [0, {}, None])
+        state[2] = open_ports
+        self._collect(False)
+        self._maybe_finish(idx)
+
+    #Function to report the grabs that have finished- waits for one when block is set
+    def _collect(self, block):
+        while True:
+            try:
+                idx, ip, port, latency, data = self.results.get(block)
+            except queue.Empty:
+                return
+            block = False
+            banner = (fingerprint(data), banner_text(data)) if data else None
+            state = self.targets[idx]
+            state[0] -= 1
+            state[1][port] = banner
+            self.outer_open(idx, ip, port, latency, banner)
+            self._maybe_finish(idx)
+
+    def _maybe_finish(self, idx):
+        state = self.targets[idx]
+        if state[2] is not None and state[0] == 0:
+            del self.targets[idx]
+            self.outer_done(idx, state[2], state[1])
+
+    #Function to wait for every grab still in flight once the scan is over, then stop the banner thread
+    def drain(self):
+        while self.targets:
+            self._collect(True)
+        self.close()
+
+    def close(self):
+        if self.loop.is_closed():
+            return
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
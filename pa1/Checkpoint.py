@@ -0,0 +1,125 @@
+import json
+import os
+import time
+
+from PortSet import chunk_ports
+from Targets import merge_interval, subtract_intervals
+
+CHECKPOINT_PORTS = 1024 #Ports per journaled chunk- small enough to resume mid-target, big enough to keep writes rare
+
+#Function to turn an ascending port iterable into (lo, hi) runs
+def port_runs(ports):
+    runs = []
+    for port in ports:
+        if runs and runs[-1][1] == port - 1:
+            runs[-1][1] = port
+        else:
+            runs.append([port, port])
+    return runs
+
+#Append-only journal of finished (host, port chunk) pieces and the open ports found in them
+#Every line is one JSON record {"ip": ..., "ranges": [[lo, hi], ...], "open": [[port, latency], ...]}
+class ScanJournal():
+    def __init__(self, path, resume=False, sync_every=5.0):
+        self.done = {}  # ip -> port intervals already finished in an earlier run
+        self.found = {} # ip -> [(port, latency)] open ports found in them
+        if resume and os.path.exists(path):
+            self._load(path)
+        self.file = open(path, "a" if resume else "w")
+        if resume and self.file.tell() > 0:
+            with open(path, "rb") as file:
+                file.seek(-1, os.SEEK_END)
+                if file.read(1) != b"\n": #Finish the line the interruption cut short so the next record starts clean
+                    self.file.write("\n")
+        self.sync_every = sync_every
+        self.last_sync = time.monotonic()
+
+    #Function to read back an earlier run's journal
+    def _load(self, path):
+        with open(path, "r") as file:
+            for line in file:
+                try:
+                    record = json.loads(line)
+                    ip, ranges, hits = record["ip"], record["ranges"], record["open"]
+                except (ValueError, KeyError, TypeError): #A line cut short by the interruption- that chunk just gets scanned again
+                    continue
+                covered = self.done.get(ip, ())
+                for lo, hi in ranges:
+                    covered = merge_interval(covered, lo, hi)
+                self.done[ip] = covered
+                self.found.setdefault(ip, []).extend((port, latency) for port, latency in hits)
+
+    #Function to split a job into the ports still to scan and the open ports an earlier run already found in it
+    def remaining(self, ip, ports):
+        covered = self.done.get(ip)
+        if not covered:
+            return ports, []
+        left = []
+        for lo, hi in port_runs(ports):
+            for r_lo, r_hi in subtract_intervals(lo, hi, covered):
+                left.extend(range(r_lo, r_hi + 1))
+        wanted = set(ports) if isinstance(ports, list) else ports
+        replay = [(port, latency) for port, latency in self.found.get(ip, []) if port in wanted]
+        return left, replay
+
+    #Function to append one finished chunk- flushed right away, fsync'd every few seconds to keep the overhead low
+    def record(self, ip, ports, hits):
+        self.file.write(json.dumps({"ip": ip, "ranges": port_runs(ports), "open": hits}) + "\n")
+        self.file.flush()
+        now = time.monotonic()
+        if now - self.last_sync >= self.sync_every:
+            os.fsync(self.file.fileno())
+            self.last_sync = now
+
+    def close(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.file.close()
+
+#Wraps a stream of scan jobs so every target is scanned in journaled chunks- work a resumed journal already
+#covers is skipped (its findings are replayed), and the chunk results are put back together per target
+class CheckpointedScan():
+    def __init__(self, journal, on_open, on_done, chunk_size=CHECKPOINT_PORTS):
+        self.journal = journal
+        self.outer_open = on_open
+        self.outer_done = on_done
+        self.chunk_size = chunk_size
+        self.chunks = {}  # chunk idx -> (target idx, ip, ports, hits)
+        self.targets = {} # target idx -> [open ports so far, chunks still running, all chunks handed out]
+
+    #Function to turn target jobs into chunk jobs
+    def jobs(self, jobs):
+        chunk_idx = 0
+        for idx, (ip, ports) in enumerate(jobs):
+            left, replay = self.journal.remaining(ip, ports)
+            state = self.targets[idx] = [[], 0, False]
+            for port, latency in replay:
+                state[0].append(port)
+                self.outer_open(idx, ip, port, latency)
+            for chunk in chunk_ports(left, self.chunk_size):
+                self.chunks[chunk_idx] = (idx, ip, chunk, [])
+                state[1] += 1
+                yield ip, chunk
+                chunk_idx += 1
+            state[2] = True
+            self._maybe_finish(idx)
+
+    def on_open(self, chunk_idx, ip, port, latency):
+        idx, _, _, hits = self.chunks[chunk_idx]
+        hits.append((port, latency))
+        self.outer_open(idx, ip, port, latency)
+
+    def on_done(self, chunk_idx, open_ports):
+        idx, ip, ports, hits = self.chunks.pop(chunk_idx)
+        self.journal.record(ip, ports, hits)
+        state = self.targets[idx]
+        state[0].extend(open_ports)
+        state[1] -= 1
+        self._maybe_finish(idx)
+
+    #Function to report a target once all of its chunks are back- ports are ascending in every job, so sorting restores their order
+    def _maybe_finish(self, idx):
+        state = self.targets[idx]
+        if state[2] and state[1] == 0:
+            del self.targets[idx]
+            self.outer_done(idx, sorted(state[0]))
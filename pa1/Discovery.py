@@ -0,0 +1,73 @@
+import queue
+import threading
+from itertools import islice
+
+DEFAULT_DISCOVERY_PORTS = "22,80,443,445,3389"
+DISCOVERY_BATCH = 256 #Hosts checked together before their full sweeps are handed on
+CACHE_LIMIT = 65536   #Hosts whose answer is remembered for later lines of the same file
+_END = object()       #Marks the end of the discovered job stream
+
+#Wraps a stream of scan jobs with a host-discovery pre-pass: the hosts of each batch are probed on a few common
+#ports first, and only hosts that connected or refused on at least one of them go on to the full port sweep.
+#Discovery runs ahead in its own thread (with its own engine and event loop), so it overlaps with the sweeps
+#of hosts already found alive instead of adding a serial pass in front of them
+class HostDiscovery():
+    def __init__(self, engine, ports, on_open, on_done, on_dead, on_diff=None, batch=DISCOVERY_BATCH):
+        self.engine = engine #Only ever used from the discovery thread
+        self.ports = list(ports)
+        self.outer_open = on_open
+        self.outer_done = on_done
+        self.outer_dead = on_dead
+        self.outer_diff = on_diff #Set for diff mode
+        self.batch = batch
+        self.alive = {}   # ip -> whether it answered, for hosts listed more than once
+        self.mapping = {} # idx of a live job handed on -> idx of the original job
+
+    #Discovery thread- classifies the jobs a batch at a time and queues (idx, ip, ports, alive)
+    def _discover(self, jobs, out):
+        try:
+            it = enumerate(jobs)
+            batch = list(islice(it, self.batch))
+            while batch:
+                #Forget the cache before the batch is looked up in it, so every host of the batch is either still cached or probed now
+                if len(self.alive) > CACHE_LIMIT:
+                    self.alive.clear()
+                unknown = {ip for _, (ip, _) in batch if ip not in self.alive}
+                if unknown:
+                    live = self.engine.live_hosts(unknown, self.ports)
+                    for ip in unknown:
+                        self.alive[ip] = ip in live
+                for idx, (ip, ports) in batch:
+                    out.put((idx, ip, ports, self.alive[ip]))
+                batch = list(islice(it, self.batch))
+            out.put(_END)
+        except BaseException as e: #Hand the failure to the scanning side instead of dying silently
+            out.put(e)
+
+    #Function to hand on the jobs of live hosts- dead hosts are reported right here, on the caller's thread
+    def jobs(self, jobs):
+        out = queue.Queue(maxsize=2 * self.batch)
+        threading.Thread(target=self._discover, args=(jobs, out), daemon=True, name="discovery").start()
+        out_idx = 0
+        while True:
+            item = out.get()
+            if item is _END:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            idx, ip, ports, alive = item
+            if not alive:
+                self.outer_dead(idx)
+                continue
+            self.mapping[out_idx] = idx
+            yield ip, ports
+            out_idx += 1
+
+    def on_open(self, idx, ip, port, latency):
+        self.outer_open(self.mapping[idx], ip, port, latency)
+
+    def on_done(self, idx, open_ports):
+        self.outer_done(self.mapping.pop(idx), open_ports)
+
+    def on_diff(self, idx, opened, closed):
+        self.outer_diff(self.mapping.pop(idx), opened, closed)
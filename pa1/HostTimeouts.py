@@ -0,0 +1,37 @@
+import errno
+
+#Smoothed RTT estimator per host (RFC 6298 style) used to pick how long a connect may take before the port counts as dead
+class HostTimeouts():
+    ALPHA = 1 / 8 #Gain for the smoothed RTT
+    BETA = 1 / 4  #Gain for the RTT variance
+    K = 4         #How many variances of slack to allow above the smoothed RTT
+
+    def __init__(self, floor=0.05, ceiling=1.0):
+        if floor <= 0 or ceiling < floor:
+            raise ValueError("timeouts need 0 < floor <= ceiling")
+        self.floor = floor
+        self.ceiling = ceiling
+        self.hosts = {} # ip -> [srtt, rttvar]
+
+    #Function to get the current connect timeout for a host- the ceiling until it has answered at least once
+    def timeout(self, ip):
+        est = self.hosts.get(ip)
+        if est is None:
+            return self.ceiling
+        srtt, rttvar = est
+        return min(self.ceiling, max(self.floor, srtt + self.K * rttvar))
+
+    #Function to fold one measured round trip (a completed connect or a refusal) into the host's estimate
+    def sample(self, ip, rtt):
+        est = self.hosts.get(ip)
+        if est is None:
+            self.hosts[ip] = [rtt, rtt / 2]
+            return
+        srtt, rttvar = est
+        est[1] = (1 - self.BETA) * rttvar + self.BETA * abs(srtt - rtt)
+        est[0] = (1 - self.ALPHA) * srtt + self.ALPHA * rtt
+
+    #Function to tell whether a connect_ex result was an actual answer from the host (and so a usable RTT sample)
+    @staticmethod
+    def answered(result):
+        return result == 0 or result == errno.ECONNREFUSED
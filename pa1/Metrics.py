@@ -0,0 +1,169 @@
+import errno
+import json
+import os
+import time
+from array import array
+from bisect import bisect_left
+
+BUCKETS = [0.0001 * 2 ** i for i in range(16)] #Latency histogram bucket upper bounds- 0.1ms doubling up to ~3.3s, plus one overflow bucket
+MAX_HOSTS = 4096   #Hosts tracked one by one- the rest of a big sweep is folded into OTHER
+OTHER = "(other)"
+SNAPSHOT_EVERY = 5.0
+
+#Function to name a probe outcome from its errno- 0 is a completed connect, None a probe that got no answer in time
+def outcome_name(err):
+    if err is None or err in (errno.EAGAIN, errno.ETIMEDOUT):
+        return "TIMEOUT"
+    if err == 0:
+        return "OK"
+    return errno.errorcode.get(err, str(err))
+
+#Function to format a number of seconds as milliseconds for the summary
+def ms(seconds):
+    return "-" if seconds is None else f"{seconds * 1000:.1f}ms"
+
+#Probe counts for one host (or for the whole scan)- outcome counts, time spent per outcome and a latency
+#histogram of the probes the host actually answered (a connect or a refusal), which is what the timeouts are tuned on
+class ProbeStats():
+    def __init__(self):
+        self.outcomes = {} # outcome name -> [probes, seconds spent on them]
+        self.histogram = array('L', [0] * (len(BUCKETS) + 1))
+
+    def add(self, outcome, latency):
+        counts = self.outcomes.get(outcome)
+        if counts is None:
+            counts = self.outcomes[outcome] = [0, 0.0]
+        counts[0] += 1
+        counts[1] += latency
+        if outcome == "OK" or outcome == "ECONNREFUSED":
+            self.histogram[bisect_left(BUCKETS, latency)] += 1
+
+    def merge(self, other):
+        for outcome, (probes, seconds) in other.outcomes.items():
+            counts = self.outcomes.setdefault(outcome, [0, 0.0])
+            counts[0] += probes
+            counts[1] += seconds
+        for i, count in enumerate(other.histogram):
+            self.histogram[i] += count
+
+    def probes(self):
+        return sum(counts[0] for counts in self.outcomes.values())
+
+    def seconds(self):
+        return sum(counts[1] for counts in self.outcomes.values())
+
+    #Function to estimate the q-th percentile answered latency- the upper bound of the bucket it falls in
+    def percentile(self, q):
+        total = sum(self.histogram)
+        if not total:
+            return None
+        rank = q / 100 * total
+        seen = 0
+        for i, count in enumerate(self.histogram):
+            seen += count
+            if seen >= rank and count:
+                return BUCKETS[i] if i < len(BUCKETS) else float("inf")
+        return None
+
+    def to_dict(self):
+        return {
+            "probes": self.probes(),
+            "seconds": round(self.seconds(), 4),
+            "outcomes": {name: {"probes": probes, "seconds": round(seconds, 4)} for name, (probes, seconds) in sorted(self.outcomes.items())},
+            "histogram": list(self.histogram),
+            "p50_ms": None if self.percentile(50) is None else round(self.percentile(50) * 1000, 3),
+            "p99_ms": None if self.percentile(99) is None else round(self.percentile(99) * 1000, 3),
+        }
+
+    #Function to list the outcome counts on one line, e.g. "OK 5, ECONNREFUSED 900, TIMEOUT 50 (10.0s)"
+    def outcome_line(self):
+        parts = []
+        for name, (probes, seconds) in sorted(self.outcomes.items(), key=lambda item: -item[1][0]):
+            parts.append(f"{name} {probes} ({seconds:.1f}s)" if name == "TIMEOUT" else f"{name} {probes}")
+        return ", ".join(parts)
+
+#Per-probe instrumentation for a scan- every probe is counted by host and errno outcome, answered connects go into
+#latency histograms, and the number of probes in flight is tracked. Optionally written to a JSON snapshot file
+#every few seconds while the scan runs
+class ScanMetrics():
+    def __init__(self, snapshot_path=None, snapshot_every=SNAPSHOT_EVERY):
+        self.total = ProbeStats()
+        self.hosts = {} # ip -> ProbeStats
+        self.inflight = 0
+        self.peak_inflight = 0
+        self.start_time = time.monotonic()
+        self.snapshot_path = snapshot_path
+        self.snapshot_every = snapshot_every
+        self.last_snapshot = self.start_time
+
+    #Function to note a probe going out
+    def start(self):
+        self.inflight += 1
+        if self.inflight > self.peak_inflight:
+            self.peak_inflight = self.inflight
+
+    #Function to record how a probe ended- err is its errno (0 for a completed connect, None for no answer)
+    def record(self, ip, err, latency):
+        self.inflight = max(0, self.inflight - 1)
+        outcome = outcome_name(err)
+        self.total.add(outcome, latency)
+        self._host(ip).add(outcome, latency)
+        self.maybe_snapshot()
+
+    #Function to write a snapshot if one is due- called after every probe, and by the sharded scan while it waits on its workers
+    def maybe_snapshot(self):
+        if self.snapshot_path is not None:
+            now = time.monotonic()
+            if now - self.last_snapshot >= self.snapshot_every:
+                self.write_snapshot()
+                self.last_snapshot = now
+
+    def _host(self, ip):
+        stats = self.hosts.get(ip)
+        if stats is None:
+            if len(self.hosts) >= MAX_HOSTS:
+                ip = OTHER
+                stats = self.hosts.get(OTHER)
+            if stats is None:
+                stats = self.hosts[ip] = ProbeStats()
+        return stats
+
+    #Function to fold in the metrics a worker process collected
+    def merge(self, other):
+        self.total.merge(other.total)
+        for ip, stats in other.hosts.items():
+            self._host(ip).merge(stats)
+        self.peak_inflight = max(self.peak_inflight, other.peak_inflight)
+        self.maybe_snapshot()
+
+    def snapshot(self):
+        return {
+            "timestamp": time.time(),
+            "elapsed": round(time.monotonic() - self.start_time, 3),
+            "inflight": self.inflight,
+            "peak_inflight": self.peak_inflight,
+            "buckets_ms": [round(bound * 1000, 3) for bound in BUCKETS],
+            "total": self.total.to_dict(),
+            "hosts": {ip: stats.to_dict() for ip, stats in self.hosts.items()},
+        }
+
+    #Function to write the current snapshot- written to a temporary file first, so a reader never sees half of one
+    def write_snapshot(self):
+        tmp = self.snapshot_path + ".tmp"
+        with open(tmp, "w") as file:
+            json.dump(self.snapshot(), file)
+        os.replace(tmp, self.snapshot_path)
+
+    #Function to build the end-of-run summary- overall outcomes and latency, then the hosts that took the most time
+    def summary_lines(self, top=10):
+        out_lines = []
+        out_lines.append(f"Probe outcomes: {self.total.outcome_line() or 'none'}")
+        out_lines.append(f"Answered latency: p50 {ms(self.total.percentile(50))}, p90 {ms(self.total.percentile(90))}, p99 {ms(self.total.percentile(99))}")
+        out_lines.append(f"Peak probes in flight: {self.peak_inflight}")
+        slowest = sorted(self.hosts.items(), key=lambda item: -item[1].seconds())[:top]
+        if slowest:
+            out_lines.append(f"Hosts by time spent (top {len(slowest)} of {len(self.hosts)}):")
+            for ip, stats in slowest:
+                out_lines.append(f"  {ip}: {stats.probes()} probes, {stats.seconds():.2f}s, p50 {ms(stats.percentile(50))}, "
+                                 f"p99 {ms(stats.percentile(99))}- {stats.outcome_line()}")
+        return out_lines
@@ -0,0 +1,90 @@
+import asyncio
+import time
+
+#Token bucket that hands out send times- callers reserve a token and wait however long it says
+class TokenBucket():
+    def __init__(self, rate, burst=None):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = float(rate)
+        self.capacity = float(burst) if burst else max(1.0, self.rate / 20) #About 50ms worth of burst
+        self.tokens = self.capacity
+        self.stamp = time.monotonic()
+
+    #Function to reserve one token- returns how many seconds to wait before using it
+    def delay(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.stamp) * self.rate)
+        self.stamp = now
+        self.tokens -= 1 #May go negative- that debt is what the next callers wait out
+        if self.tokens >= 0:
+            return 0.0
+        return -self.tokens / self.rate
+
+#Global plus per-host rate limit in probes (SYN packets) per second
+class Pacer():
+    def __init__(self, max_rate=None, host_rate=None):
+        self.max_rate = max_rate
+        self.host_rate = host_rate
+        self.bucket = TokenBucket(max_rate) if max_rate else None
+        self.host_buckets = {} # ip -> TokenBucket
+
+    #Function to reserve a probe slot towards ip- returns the seconds to wait before sending it
+    def delay(self, ip):
+        wait = self.bucket.delay() if self.bucket is not None else 0.0
+        if self.host_rate:
+            bucket = self.host_buckets.get(ip)
+            if bucket is None:
+                bucket = self.host_buckets[ip] = TokenBucket(self.host_rate)
+            wait = max(wait, bucket.delay())
+        return wait
+
+    #Function to block the calling thread until the next probe towards ip may go out
+    def wait(self, ip):
+        wait = self.delay(ip)
+        if wait > 0:
+            time.sleep(wait)
+
+    #Function to split the rate budget evenly across n worker processes
+    def split(self, n):
+        return Pacer(self.max_rate / n if self.max_rate else None, self.host_rate / n if self.host_rate else None)
+
+#Additive-increase / multiplicative-decrease cap on how many connects may be in flight
+class AimdLimiter():
+    def __init__(self, max_limit, min_limit=None, threshold=0.2, decrease=0.5, increase=None):
+        self.max_limit = max(1, int(max_limit))
+        self.min_limit = min_limit if min_limit else max(1, self.max_limit // 16)
+        self.limit = float(self.max_limit)
+        self.threshold = threshold #Timeout ratio above which a window counts as congested
+        self.decrease = decrease
+        self.increase = increase if increase else max(1, self.max_limit // 32)
+        self.in_flight = 0
+        self.answered = 0
+        self.timed_out = 0
+        self.cond = None #Created on first use so it belongs to the running event loop
+
+    #Function to wait for a free slot under the current limit
+    async def acquire(self):
+        if self.cond is None:
+            self.cond = asyncio.Condition()
+        async with self.cond:
+            await self.cond.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+
+    #Function to give a slot back and record whether its connect timed out
+    async def release(self, timed_out):
+        if timed_out:
+            self.timed_out += 1
+        else:
+            self.answered += 1
+        #Judge one window's worth of outcomes at a time (roughly one round of the current limit)
+        if self.answered + self.timed_out >= max(8, int(self.limit)):
+            ratio = self.timed_out / (self.answered + self.timed_out)
+            if ratio > self.threshold:
+                self.limit = max(self.min_limit, self.limit * self.decrease)
+            else:
+                self.limit = min(self.max_limit, self.limit + self.increase)
+            self.answered = self.timed_out = 0
+        async with self.cond:
+            self.in_flight -= 1
+            self.cond.notify(max(0, int(self.limit) - self.in_flight))
@@ -1,13 +1,38 @@
 import socket
 import argparse
 import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, wait
+
+from Banners import BANNER_BYTES, BANNER_TIMEOUT, BannerStage
+from Checkpoint import CheckpointedScan, ScanJournal
+from Discovery import DEFAULT_DISCOVERY_PORTS, HostDiscovery
+from HostTimeouts import HostTimeouts
+from Metrics import SNAPSHOT_EVERY, ScanMetrics
+from Pacing import Pacer
+from PortSet import DEFAULT_SPEC, chunk_ports, parse_ports
+from ResultStore import IncrementalScan, ResultStore, parse_duration
+from ReportWriter import WRITERS, make_writer, report_lines
+from ScanEngine import ScanEngine
+from Services import load_services
+from SynScan import SYN_WINDOW, SynEngine, syn_supported
+from Targets import read_targets
 
 #Function to perform port scan
-def scan_port(ip, port):
+def scan_port(ip, port, timeouts=None, metrics=None):
     #AF_INET = internet address family for IPv4 and SOCK_STREAM = socket type for TCP
     sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    sock.settimeout(1) #1 Second Timeout
+    #1 Second Timeout unless we have a per-host estimate from earlier answers
+    sock.settimeout(timeouts.timeout(ip) if timeouts is not None else 1)
+    if metrics is not None:
+        metrics.start()
+    start = time.perf_counter()
     result = sock.connect_ex((ip, port))
+    if timeouts is not None and HostTimeouts.answered(result):
+        timeouts.sample(ip, time.perf_counter() - start)
+    if metrics is not None:
+        metrics.record(ip, result, time.perf_counter() - start)
     sock.close() #close the socket
     return result == 0
 
@@ -19,100 +44,161 @@ def help_msg():
     To run the Port Scanner on Command Line: python3 PortScanner.py option1, ..., option N
 
     Available options:
-        --ports <port1, port2, ...>                                     (Scans Ports [1-1024] by default)
+        --ports <port1, port2, lo-hi, !port, ...>                       (Scans Ports [1-1024] by default)
         --ip <IP address to scan>                                       (Scans localhost by defualt)
         --input <file name>
         --output <file name>                                            (Outputs to console by default)
+        --format <text|jsonl|csv>                                       (Report format, text by default)
+        --services <file name>                                          (Services file used to name ports, system one by default)
+        --concurrency <N>                                               (Keeps up to N connects in flight at once)
+        --workers <N>                                                   (Splits the scan across N processes)
+        --max-rate <probes per second>                                  (Caps the overall connect rate)
+        --max-host-rate <probes per second>                             (Caps the connect rate towards each host)
+        --aimd                                                          (Backs off --concurrency when timeouts pile up)
+        --min-timeout <seconds>                                         (Lowest per-host connect timeout, 0.05 by default)
+        --max-timeout <seconds>                                         (Highest per-host connect timeout, 1 by default)
+        --state <file name>                                             (Journals finished work so the scan can be resumed)
+        --resume                                                        (Skips the work already journaled in --state)
+        --store <file name>                                             (Keeps every host's last known open ports in an SQLite file)
+        --diff                                                          (With --store: rescan known-open ports plus a sample, report changes only)
+        --since <duration>                                              (With --diff: full sweep hosts last swept longer ago, 7d by default)
+        --sample <fraction>                                             (With --diff: share of the other ports to spot-check, 0.05 by default)
+        --syn                                                           (Half-open SYN scan over raw sockets- Linux, needs root or CAP_NET_RAW)
+        --banners                                                       (Reads each open port's banner and names the service from it)
+        --banner-bytes <N>                                              (With --banners: most bytes read per port, 256 by default)
+        --banner-timeout <seconds>                                      (With --banners: most time spent per port, 2 by default)
+        --metrics                                                       (Prints probe outcomes, latency and in-flight counts to stderr at the end)
+        --metrics-file <file name>                                      (Writes the same metrics as a JSON snapshot while the scan runs)
+        --metrics-interval <seconds>                                    (With --metrics-file: seconds between snapshots, 5 by default)
+        --discover                                                      (Skips hosts that answer on none of the --discovery-ports)
+        --discovery-ports <port1, port2, lo-hi, ...>                    (With --discover: ports probed first, 22,80,443,445,3389 by default)
         --help                                                          (Display this prompt again!)
     Please note choosing --input will override any --ports or --ip commands
     """
     print(help_text)
 
-#Function to retrieve port number and service name associated
-def get_service_port(port):
-    try:
-        return socket.getservbyport(port, 'tcp') #Translates to a port number for that service w/ TCP protocol
-    except OSError: #If no service name for port number- leave blank
-        return ""
-
 #Function to get ports from input list
 def get_ports(args):
-    if args.ports:
-        try:
-            #Record the input ports from list- accepts integers separated by comma
-            return [int(p.strip()) for p in args.ports.split(',')]
-        except ValueError:
-            print("Error: Please separate INTEGER inputs with commas")
-            sys.exit(1)
-    else:
-        #Default to ports 1 to 1024
-        return list(range(1, 1025))
+    try:
+        #Record the input ports as a bitmap port set- accepts ports, ranges and !exclusions separated by commas
+        return parse_ports(args.ports if args.ports else DEFAULT_SPEC) #Default to ports 1 to 1024
+    except ValueError:
+        print("Error: Please give ports (1-65535) or ranges separated by commas, e.g. 1-1024,3306,!25")
+        sys.exit(1)
 
-#Function to parse through input file
+#Function to parse through input file- lazily yields one (ip, ports, port display) job per host it expands to
+#Host columns may be IPs, hostnames, CIDR blocks or ranges, and ports a host already got from an earlier line are not scanned again
 def process_input_file(filename):
-    targets = []
-    with open(filename, "r") as file: #Parse through file and record content
-        for line in file:
-            line = line.strip()
-            if not line:
-                continue
-            parts = line.split('\t') #Split line into 3 parts based on tab spaces in file
-            ip, port_start, port_end = parts 
-
-            try:
-                port_start = int(port_start)
-                port_end = int(port_end)
-            except ValueError: #Assuming the file is valid and follows proper structure- skips any invalid line
-                continue
-            targets.append((ip, port_start, port_end))
-    return targets
+    for ip, ranges in read_targets(filename):
+        if len(ranges) == 1:
+            ports = range(ranges[0][0], ranges[0][1] + 1)
+        else: #Only happens when an earlier line overlapped part of this one
+            ports = [port for lo, hi in ranges for port in range(lo, hi + 1)]
+        yield ip, ports, ",".join(f"{lo}--{hi}" for lo, hi in ranges)
 
-#Function to format output for multiple inputs
-def scan_targets_input(ip, start_port, end_port):
-    #Display Format
-    out_lines = []
-    out_lines.append(f"Address: {ip}")
-    out_lines.append(f"Ports: {start_port}--{end_port}")
-    out_lines.append(f"Displaying open ports on: {ip}")
-
-    #Performs Scan
+#Function to check which ports are open- one at a time, or through the concurrent engine if given
+#on_open(ip, port, latency) is called for every open port as soon as it is found
+def find_open_ports(ip, ports, engine=None, timeouts=None, pacer=None, on_open=None, metrics=None):
+    if engine is not None:
+        return engine.scan(ip, ports, None if on_open is None else lambda idx, ip, port, latency: on_open(ip, port, latency))
     open_ports = []
-    for port in range(start_port, end_port + 1): #Check which ports are open
-        if scan_port(ip, port):
+    for port in ports:
+        if pacer is not None:
+            pacer.wait(ip)
+        start = time.perf_counter()
+        if scan_port(ip, port, timeouts, metrics):
             open_ports.append(port)
-    if open_ports:
-        for p in open_ports:
-            service = get_service_port(p)#If we can find a common name, append it to display
-            if service:
-                out_lines.append(f"Port {p}: OPEN {service}")
-            else:
-                out_lines.append(f"Port {p}: OPEN")
-    else:
-        out_lines.append("No open ports found")
-    out_lines.append("")
-    return out_lines
+            if on_open is not None:
+                on_open(ip, port, time.perf_counter() - start)
+    return open_ports
+
+#Function to format output for multiple inputs
+def scan_targets_input(ip, start_port, end_port, engine=None):
+    open_ports = find_open_ports(ip, range(start_port, end_port + 1), engine)
+    return report_lines(ip, f"{start_port}--{end_port}", "Displaying open ports on:", open_ports)
 
 #Function to format output for one input-- basically the same as the previous scan_targets_input
-def scan_target(ip, ports, port_display):
-    out_lines = []
-    out_lines.append(f"Address: {ip}")
-    out_lines.append(f"Ports: {port_display}")
-    out_lines.append(f"Showing open ports on: {ip}") 
+def scan_target(ip, ports, port_display, engine=None):
+    open_ports = find_open_ports(ip, ports, engine)
+    return report_lines(ip, port_display, "Showing open ports on:", open_ports)
+
+SHARD_PORTS = 256 #Ports per shard handed to a worker process
+
+#Function to lazily split (ip, ports) jobs into (job index, ip, port slice, last shard of its job) shards in scan order
+def shard_jobs(jobs, shard_size):
+    for idx, (ip, ports) in enumerate(jobs):
+        pending = None
+        for chunk in chunk_ports(ports, shard_size):
+            if pending is not None:
+                yield idx, ip, pending, False
+            pending = chunk
+        yield idx, ip, pending if pending is not None else [], True #An empty job still gets reported
+
+#Function run inside each worker process- scans one shard and returns its open ports with their connect latency,
+#plus the shard's probe metrics if asked for
+def scan_shard(ip, ports, concurrency=None, timeouts=None, pacer=None, aimd=False, with_metrics=False):
+    metrics = ScanMetrics() if with_metrics else None
+    engine = ScanEngine(concurrency, timeouts=timeouts, pacer=pacer, aimd=aimd, metrics=metrics) if concurrency else None
+    latencies = {}
+    #The engine finds ports in whatever order they answer- take the order from the list it returns, not from the callbacks
+    open_ports = find_open_ports(ip, ports, engine, timeouts, pacer, lambda ip, port, latency: latencies.__setitem__(port, latency), metrics)
+    return [(port, latencies[port]) for port in open_ports], metrics
+
+#Function to scan jobs across a pool of processes and merge the results back per job
+def scan_sharded(jobs, workers, concurrency=None, timeouts=None, pacer=None, aimd=False, on_open=None, on_done=None, metrics=None):
+    shard_size = max(SHARD_PORTS, concurrency or 0) #Give each worker's engine enough ports to fill its pool
+    if pacer is not None:
+        pacer = pacer.split(workers) #Each process gets an even share of the rate budget
+    window = deque() #Shards handed to the pool but not merged yet- a few per worker so nobody idles
     open_ports = []
-    for port in ports:
-        if scan_port(ip, port):
+
+    #Function to wait for the oldest shard and merge it- shards are merged in the order they were cut,
+    #so each job's ports come back in the order they were asked for
+    def merge_oldest():
+        nonlocal open_ports
+        idx, ip, last, future = window.popleft()
+        #Shards only report their metrics when they finish, so keep the snapshot file going while waiting on a slow one
+        if metrics is not None:
+            while not wait([future], timeout=metrics.snapshot_every).done:
+                metrics.maybe_snapshot()
+        hits, shard_metrics = future.result()
+        if metrics is not None:
+            metrics.merge(shard_metrics)
+        for port, latency in hits:
             open_ports.append(port)
-    if open_ports:
-        for p in open_ports:
-            service = get_service_port(p)
-            if service:
-                out_lines.append(f"Port {p}: OPEN {service}")
-            else:
-                out_lines.append(f"Port {p}: OPEN")
+            if on_open is not None:
+                on_open(idx, ip, port, latency)
+        if last:
+            on_done(idx, open_ports)
+            open_ports = []
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        #Every shard starts from a copy of the timeout estimates and learns its hosts' RTT on its own
+        for idx, ip, ports, last in shard_jobs(jobs, shard_size):
+            window.append((idx, ip, last, pool.submit(scan_shard, ip, ports, concurrency, timeouts, pacer, aimd, metrics is not None)))
+            if len(window) >= workers * 4:
+                merge_oldest()
+        while window:
+            merge_oldest()
+
+#Function to find the open ports of every (ip, ports) job with whichever scan mode was requested
+#Returns the open ports of each job in order- unless on_done(idx, open_ports) is given, in which case
+#each job is handed to it as soon as it finishes, while on_open(idx, ip, port, latency) sees every open port as it is found
+#metrics, if given, records every probe (an engine records into its own)
+def scan_jobs(jobs, engine=None, workers=None, concurrency=None, timeouts=None, pacer=None, aimd=False, on_open=None, on_done=None, metrics=None):
+    results = {}
+    if on_done is None:
+        on_done = results.__setitem__
+    if workers and workers > 1:
+        scan_sharded(jobs, workers, concurrency, timeouts, pacer, aimd, on_open, on_done, metrics)
+    elif engine is not None:
+        #Stream every target through the engine at once so its connection pool stays full between hosts
+        engine.scan_many(jobs, on_open, on_done)
     else:
-        out_lines.append("No open ports found")
-    out_lines.append("")
-    return out_lines
+        for idx, (ip, ports) in enumerate(jobs):
+            hit = None if on_open is None else lambda ip, port, latency, idx=idx: on_open(idx, ip, port, latency)
+            on_done(idx, find_open_ports(ip, ports, None, timeouts, pacer, hit, metrics))
+    return [results[idx] for idx in range(len(results))]
     
 def main():
     parser = argparse.ArgumentParser(add_help = False) 
@@ -120,6 +206,30 @@ def main():
     parser.add_argument("--ip", type =str, default = "127.0.0.1") #Default IP address of localhost
     parser.add_argument("--input", type=str)
     parser.add_argument("--output", type=str)
+    parser.add_argument("--format", type=str, default="text", choices=sorted(WRITERS))
+    parser.add_argument("--services", type=str)
+    parser.add_argument("--concurrency", type=int)
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--max-rate", type=float)
+    parser.add_argument("--max-host-rate", type=float)
+    parser.add_argument("--aimd", action="store_true")
+    parser.add_argument("--min-timeout", type=float, default=0.05)
+    parser.add_argument("--max-timeout", type=float, default=1.0)
+    parser.add_argument("--state", type=str)
+    parser.add_argument("--resume", action="store_true")
+    parser.add_argument("--store", type=str)
+    parser.add_argument("--diff", action="store_true")
+    parser.add_argument("--since", type=str, default="7d")
+    parser.add_argument("--sample", type=float, default=0.05)
+    parser.add_argument("--syn", action="store_true")
+    parser.add_argument("--banners", action="store_true")
+    parser.add_argument("--banner-bytes", type=int, default=BANNER_BYTES)
+    parser.add_argument("--banner-timeout", type=float, default=BANNER_TIMEOUT)
+    parser.add_argument("--metrics", action="store_true")
+    parser.add_argument("--metrics-file", type=str)
+    parser.add_argument("--metrics-interval", type=float, default=SNAPSHOT_EVERY)
+    parser.add_argument("--discover", action="store_true")
+    parser.add_argument("--discovery-ports", type=str, default=DEFAULT_DISCOVERY_PORTS)
     parser.add_argument("--help", action="store_true")
     
     args = parser.parse_args()
@@ -129,31 +239,192 @@ def main():
         help_msg()
         sys.exit(0) #Terminate program
     
-    results = [] #Contain content to display or add to output file at the end
-
-    #Check if --input was called
-    if args.input:
-        targets = process_input_file(args.input)
-        for ip, start_port, end_port in targets:
-            results.extend(scan_targets_input(ip, start_port, end_port))
-    #Runs the program with ip address requested/default on ports requested/default
-    else:
-        ip = args.ip
-        ports_list = get_ports(args)
-        if args.ports is None:
-            ports_to_run = "1-1024"
+    #Load the port -> service name table once, up front
+    try:
+        load_services(args.services)
+    except OSError as e:
+        print(f"Error: could not read services file: {e}")
+        sys.exit(1)
+
+    #Per-host connect timeouts learned from each host's measured round trip time
+    try:
+        timeouts = HostTimeouts(args.min_timeout, args.max_timeout)
+    except ValueError:
+        print("Error: timeouts must satisfy 0 < --min-timeout <= --max-timeout")
+        sys.exit(1)
+
+    #Optional global / per-host rate limits
+    pacer = None
+    if args.max_rate is not None or args.max_host_rate is not None:
+        if (args.max_rate is not None and args.max_rate <= 0) or (args.max_host_rate is not None and args.max_host_rate <= 0):
+            print("Error: --max-rate and --max-host-rate must be positive")
+            sys.exit(1)
+        pacer = Pacer(args.max_rate, args.max_host_rate)
+
+    #Optional per-probe instrumentation- counted per host and errno, summarized at the end and/or snapshotted to a file
+    metrics = None
+    if args.metrics or args.metrics_file:
+        if args.metrics_interval <= 0:
+            print("Error: --metrics-interval must be positive")
+            sys.exit(1)
+        metrics = ScanMetrics(args.metrics_file, args.metrics_interval)
+
+    #Only build the concurrent engine if asked- otherwise scan one port at a time like before
+    engine = None
+    if args.concurrency:
+        if args.concurrency < 1:
+            print("Error: --concurrency must be a positive integer")
+            sys.exit(1)
+        engine = ScanEngine(args.concurrency, timeouts=timeouts, pacer=pacer, aimd=args.aimd, metrics=metrics)
+    if args.workers is not None and args.workers < 1:
+        print("Error: --workers must be a positive integer")
+        sys.exit(1)
+
+    #Half-open scans replace the connect engine- one raw receive socket already sees every reply, so no worker processes
+    if args.syn:
+        if args.workers or args.aimd:
+            print("Error: --syn cannot be combined with --workers or --aimd")
+            sys.exit(1)
+        if not syn_supported():
+            print("Error: --syn needs Linux and root or CAP_NET_RAW")
+            sys.exit(1)
+        engine = SynEngine(args.concurrency or SYN_WINDOW, timeouts=timeouts, pacer=pacer, metrics=metrics)
+
+    if args.resume and not args.state:
+        print("Error: --resume needs the --state file of the scan to resume")
+        sys.exit(1)
+
+    if args.diff and not args.store:
+        print("Error: --diff needs the --store file of the earlier scans")
+        sys.exit(1)
+    try:
+        stale_after = parse_duration(args.since)
+    except ValueError:
+        print("Error: --since takes a duration such as 3600, 30m, 24h or 7d")
+        sys.exit(1)
+    if not 0 <= args.sample <= 1:
+        print("Error: --sample must be between 0 and 1")
+        sys.exit(1)
+
+    #Host discovery gets an engine of its own- it runs ahead of the scan on a separate thread and event loop
+    discovery_engine = None
+    if args.discover:
+        try:
+            discovery_ports = parse_ports(args.discovery_ports)
+        except ValueError:
+            print("Error: --discovery-ports takes ports or ranges separated by commas, e.g. 22,80,443")
+            sys.exit(1)
+        if args.syn:
+            discovery_engine = SynEngine(min(args.concurrency or 256, 256), timeouts=timeouts, pacer=pacer)
         else:
-            ports_to_run = args.ports
-        results.extend(scan_target(ip, ports_list, ports_to_run))
+            discovery_engine = ScanEngine(min(args.concurrency or 256, 256), timeouts=timeouts, pacer=pacer)
 
-    output_text = "\n".join(results)
-    
-    #Checks if Output file was requested
-    if args.output:
-        with open(args.output, "w") as outfile:
-            outfile.write(output_text + "\n")
-    else:
-        print(output_text)
+    if args.banners and (args.banner_bytes < 1 or args.banner_timeout <= 0):
+        print("Error: --banner-bytes and --banner-timeout must be positive")
+        sys.exit(1)
+    grab_banners = args.banners and not args.diff #Diff reports only say what opened or closed, so there is nothing to label
+
+    #Results are written out as they are found instead of being collected until the end
+    outfile = open(args.output, "w", newline="") if args.output else sys.stdout
+    writer = make_writer(args.format, outfile, args.diff, grab_banners)
+    on_open = lambda idx, ip, port, latency, banner=None: writer.found(ip, port, latency, banner)
+    if args.diff:
+        on_open = lambda idx, ip, port, latency: None #Only changes are reported, once the target is done
+    ports_scanned = 0
+    scan_start = time.perf_counter()
+
+    journal = ScanJournal(args.state, args.resume) if args.state else None
+    store = ResultStore(args.store) if args.store else None
+    banners = None
+
+    try:
+        #Check if --input was called
+        if args.input:
+            labels = {} #Display labels of the targets still being scanned- the file itself is never held in memory
+
+            #Function to turn the input file into scan jobs one host at a time
+            def input_jobs():
+                for idx, (ip, ports, port_display) in enumerate(process_input_file(args.input)):
+                    labels[idx] = (ip, port_display)
+                    yield ip, ports
+            jobs = input_jobs()
+
+            #Function to hand a finished target to the writer with its display labels
+            def on_done(idx, open_ports, grabbed=None):
+                ip, port_display = labels.pop(idx)
+                writer.done(idx, ip, port_display, "Displaying open ports on:", open_ports, grabbed)
+
+            #Function to hand a finished target's changes to the writer in --diff mode
+            def on_diff(idx, opened, closed):
+                ip, port_display = labels.pop(idx)
+                writer.diff(idx, ip, port_display, opened, closed)
+
+            #Function to report a target whose host answered on none of the discovery ports
+            def on_dead(idx):
+                ip, port_display = labels.pop(idx)
+                writer.unreachable(idx, ip, port_display, "Changes on:" if args.diff else "Displaying open ports on:")
+        #Runs the program with ip address requested/default on ports requested/default
+        else:
+            ip = args.ip
+            ports_list = get_ports(args)
+            ports_to_run = ports_list.spec() #Normalized spec, e.g. "1-24,26-1024"
+            jobs = [(ip, ports_list)]
+            on_done = lambda idx, open_ports, grabbed=None: writer.done(idx, ip, ports_to_run, "Showing open ports on:", open_ports, grabbed)
+            on_diff = lambda idx, opened, closed: writer.diff(idx, ip, ports_to_run, opened, closed)
+            on_dead = lambda idx: writer.unreachable(idx, ip, ports_to_run, "Changes on:" if args.diff else "Showing open ports on:")
+
+        #With --banners every open port's banner is grabbed while the scan goes on, and its report waits for it
+        if grab_banners:
+            banners = BannerStage(on_open, on_done, args.banner_bytes, args.banner_timeout)
+            on_open, on_done = banners.on_open, banners.on_done
+
+        #With --discover only hosts that answer on a few common ports get the full sweep- this wraps the job stream
+        #first, so the store and the journal below never hear about dead hosts
+        if discovery_engine is not None:
+            discovery = HostDiscovery(discovery_engine, discovery_ports, on_open, on_done, on_dead, on_diff)
+            jobs, on_open, on_done, on_diff = discovery.jobs(jobs), discovery.on_open, discovery.on_done, discovery.on_diff
+
+        #With --store every result is recorded, and --diff cuts targets down to what is worth rescanning
+        scan_open, scan_done = on_open, on_done
+        if store is not None:
+            incremental = IncrementalScan(store, on_done, on_diff if args.diff else None, stale_after, args.sample)
+            jobs, scan_done = incremental.jobs(jobs), incremental.on_done
+
+        #With --state every target is scanned in journaled chunks, and a resumed run skips what is already done
+        if journal is not None:
+            checkpoint = CheckpointedScan(journal, scan_open, scan_done)
+            jobs, scan_open, scan_done = checkpoint.jobs(jobs), checkpoint.on_open, checkpoint.on_done
+
+        #Function to count the ports actually handed to the scanner
+        def counted(jobs):
+            nonlocal ports_scanned
+            for ip, ports in jobs:
+                ports_scanned += len(ports)
+                yield ip, ports
+        scan_jobs(counted(jobs), engine, args.workers, args.concurrency, timeouts, pacer, args.aimd, scan_open, scan_done, metrics)
+        if banners is not None:
+            banners.drain()
+    finally:
+        if banners is not None:
+            banners.close()
+        if journal is not None:
+            journal.close()
+        if store is not None:
+            store.close()
+        if outfile is not sys.stdout:
+            outfile.close()
+
+    elapsed = time.perf_counter() - scan_start
+
+    #Scan rate goes to stderr so it never mixes into the report itself
+    rate = ports_scanned / elapsed if elapsed > 0 else 0.0
+    print(f"Scanned {ports_scanned} ports in {elapsed:.2f}s ({rate:.1f} ports/sec)", file=sys.stderr)
+    if metrics is not None:
+        if args.metrics_file:
+            metrics.write_snapshot()
+        if args.metrics:
+            for line in metrics.summary_lines():
+                print(line, file=sys.stderr)
 
 if __name__ == "__main__":
     main()
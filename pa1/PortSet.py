@@ -0,0 +1,114 @@
+from itertools import islice
+
+MAX_PORT = 65535
+DEFAULT_SPEC = "1-1024"
+
+#Set of TCP ports stored as a 65536-bit bitmap (8KB) and iterated lazily in ascending order
+class PortSet():
+    def __init__(self):
+        self.bits = bytearray((MAX_PORT + 1) // 8)
+        self.count = 0
+
+    #Function to set or clear every bit from lo to hi (inclusive)- whole bytes in the middle are filled in one slice
+    def _fill(self, lo, hi, value):
+        first, last = lo >> 3, hi >> 3
+        edges = range(lo, hi + 1) if first == last else list(range(lo, first * 8 + 8)) + list(range(last * 8, hi + 1))
+        for port in edges:
+            if value:
+                self.bits[port >> 3] |= 1 << (port & 7)
+            else:
+                self.bits[port >> 3] &= ~(1 << (port & 7))
+        if last - first > 1:
+            self.bits[first + 1:last] = (b"\xff" if value else b"\x00") * (last - first - 1)
+        self.count = int.from_bytes(self.bits, "little").bit_count()
+
+    #Function to add every port from lo to hi (inclusive)
+    def add_range(self, lo, hi):
+        self._fill(lo, hi, True)
+
+    #Function to drop every port from lo to hi (inclusive)
+    def remove_range(self, lo, hi):
+        self._fill(lo, hi, False)
+
+    def __contains__(self, port):
+        return 0 <= port <= MAX_PORT and bool(self.bits[port >> 3] & (1 << (port & 7)))
+
+    def __len__(self):
+        return self.count
+
+    #Function to walk the bitmap as (lo, hi) runs of consecutive ports- whole empty/full bytes are skipped in one step
+    def ranges(self):
+        start = None
+        for byte_idx, byte in enumerate(self.bits):
+            if byte == 0x00:
+                if start is not None:
+                    yield start, byte_idx * 8 - 1
+                    start = None
+                continue
+            if byte == 0xFF:
+                if start is None:
+                    start = byte_idx * 8
+                continue
+            for bit in range(8):
+                port = byte_idx * 8 + bit
+                if byte & (1 << bit):
+                    if start is None:
+                        start = port
+                elif start is not None:
+                    yield start, port - 1
+                    start = None
+        if start is not None:
+            yield start, MAX_PORT
+
+    def __iter__(self):
+        for lo, hi in self.ranges():
+            yield from range(lo, hi + 1)
+
+    #Function to render the set as a normalized spec, e.g. "1-24,26-1024,3306"
+    def spec(self):
+        return ",".join(str(lo) if lo == hi else f"{lo}-{hi}" for lo, hi in self.ranges())
+
+    def __str__(self):
+        return self.spec()
+
+#Function to parse one "N" or "N-M" piece of a port spec into a (lo, hi) pair
+def _parse_piece(piece):
+    lo, sep, hi = piece.partition('-')
+    lo = int(lo)
+    hi = int(hi) if sep else lo
+    if not 1 <= lo <= hi <= MAX_PORT:
+        raise ValueError(f"bad port range: {piece}")
+    return lo, hi
+
+#Function to parse a spec such as "1-1024,3306,8000-9000,!25" into a PortSet
+#Exclusions ("!N" or "!N-M") apply after every inclusion; a spec of only exclusions excludes from the default 1-1024
+def parse_ports(spec):
+    ports = PortSet()
+    excluded = []
+    included = False
+    for piece in spec.split(','):
+        piece = piece.strip()
+        if not piece:
+            continue
+        if piece.startswith('!'):
+            excluded.append(_parse_piece(piece[1:].strip()))
+        else:
+            ports.add_range(*_parse_piece(piece))
+            included = True
+    if not included:
+        ports.add_range(*_parse_piece(DEFAULT_SPEC))
+    for lo, hi in excluded:
+        ports.remove_range(lo, hi)
+    return ports
+
+#Function to cut any sized port collection into pieces of at most size ports, in order
+def chunk_ports(ports, size):
+    if isinstance(ports, range): #Slicing a range stays a small range
+        for i in range(0, len(ports), size):
+            yield ports[i:i + size]
+        return
+    it = iter(ports)
+    chunk = list(islice(it, size))
+    while chunk:
+        yield chunk
+        chunk = list(islice(it, size))
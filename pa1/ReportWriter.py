@@ -0,0 +1,156 @@
+import csv
+import json
+from datetime import datetime, timezone
+
+from Services import get_service_port
+
+#Function to build the display lines for one target from its open ports
+#banners, if given, maps a port to the (service, banner text) grabbed from it- a fingerprinted service beats the services table
+def report_lines(ip, port_display, heading, open_ports, banners=None):
+    out_lines = []
+    out_lines.append(f"Address: {ip}")
+    out_lines.append(f"Ports: {port_display}")
+    out_lines.append(f"{heading} {ip}")
+    if open_ports:
+        for p in open_ports:
+            banner = banners.get(p) if banners else None
+            service = service_name(p, banner) #If we can find a common name, append it to display
+            line = f"Port {p}: OPEN {service}" if service else f"Port {p}: OPEN"
+            if banner is not None and banner[1]:
+                line += f" ({banner[1]})"
+            out_lines.append(line)
+    else:
+        out_lines.append("No open ports found")
+    out_lines.append("")
+    return out_lines
+
+#Function to name the service on a port- the grabbed banner's fingerprint if there is one, else the services table entry
+def service_name(port, banner=None):
+    if banner is not None and banner[0]:
+        return banner[0]
+    return get_service_port(port)
+
+#Function to build the display lines for a target that answered on none of the discovery ports
+def unreachable_lines(ip, port_display, heading):
+    return [f"Address: {ip}", f"Ports: {port_display}", f"{heading} {ip}", "Host unreachable", ""]
+
+#Function to build the display lines for one target in diff mode from the ports that opened or closed since the last run
+def diff_lines(ip, port_display, opened, closed):
+    out_lines = []
+    out_lines.append(f"Address: {ip}")
+    out_lines.append(f"Ports: {port_display}")
+    out_lines.append(f"Changes on: {ip}")
+    changes = [(p, "OPENED") for p in opened] + [(p, "CLOSED") for p in closed]
+    if changes:
+        for p, change in sorted(changes):
+            service = get_service_port(p)
+            if service:
+                out_lines.append(f"Port {p}: {change} {service}")
+            else:
+                out_lines.append(f"Port {p}: {change}")
+    else:
+        out_lines.append("No changes found")
+    out_lines.append("")
+    return out_lines
+
+#Function to get the current time as an ISO 8601 UTC timestamp
+def timestamp():
+    return datetime.now(timezone.utc).isoformat(timespec="milliseconds")
+
+#Writes the classic "Address / Ports / Port N: OPEN" report, one target block at a time in target order
+class TextWriter():
+    def __init__(self, stream, diff=False, banners=False):
+        self.stream = stream
+        self.next_idx = 0
+        self.pending = {} # idx -> lines of targets that finished before an earlier one
+
+    #Open ports are only printed as part of their target's block
+    def found(self, ip, port, latency, banner=None):
+        pass
+
+    def done(self, idx, ip, port_display, heading, open_ports, banners=None):
+        self._write(idx, report_lines(ip, port_display, heading, open_ports, banners))
+
+    def diff(self, idx, ip, port_display, opened, closed):
+        self._write(idx, diff_lines(ip, port_display, opened, closed))
+
+    def unreachable(self, idx, ip, port_display, heading):
+        self._write(idx, unreachable_lines(ip, port_display, heading))
+
+    #Function to write a finished target's block- held back until every earlier target has been written
+    def _write(self, idx, lines):
+        self.pending[idx] = lines
+        while self.next_idx in self.pending:
+            for line in self.pending.pop(self.next_idx):
+                self.stream.write(line + "\n")
+            self.next_idx += 1
+        self.stream.flush()
+
+#Writes one JSON object per open port as soon as it is found
+class JsonlWriter():
+    def __init__(self, stream, diff=False, banners=False):
+        self.stream = stream
+        self.banners = banners
+
+    def found(self, ip, port, latency, banner=None):
+        record = {"host": ip, "port": port, "service": service_name(port, banner), "latency_ms": round(latency * 1000, 3), "timestamp": timestamp()}
+        if self.banners:
+            record["banner"] = banner[1] if banner is not None else None
+        self.stream.write(json.dumps(record) + "\n")
+        self.stream.flush()
+
+    def done(self, idx, ip, port_display, heading, open_ports, banners=None):
+        pass
+
+    #Function to write one record per port that opened or closed since the last run
+    def diff(self, idx, ip, port_display, opened, closed):
+        for port, change in [(p, "opened") for p in opened] + [(p, "closed") for p in closed]:
+            record = {"host": ip, "port": port, "service": get_service_port(port), "change": change, "timestamp": timestamp()}
+            self.stream.write(json.dumps(record) + "\n")
+        self.stream.flush()
+
+    #Function to write one record for a host that host discovery found dead
+    def unreachable(self, idx, ip, port_display, heading):
+        self.stream.write(json.dumps({"host": ip, "state": "unreachable", "timestamp": timestamp()}) + "\n")
+        self.stream.flush()
+
+#Writes one CSV row per open port as soon as it is found
+class CsvWriter():
+    FIELDS = ["host", "port", "service", "latency_ms", "timestamp"]
+    DIFF_FIELDS = ["host", "port", "service", "change", "timestamp"]
+
+    def __init__(self, stream, diff=False, banners=False):
+        self.stream = stream
+        self.banners = banners
+        self.writer = csv.writer(stream, lineterminator="\n")
+        if diff:
+            self.writer.writerow(self.DIFF_FIELDS)
+        else:
+            self.writer.writerow(self.FIELDS + ["banner"] if banners else self.FIELDS)
+        self.stream.flush()
+
+    def found(self, ip, port, latency, banner=None):
+        row = [ip, port, service_name(port, banner), round(latency * 1000, 3), timestamp()]
+        if self.banners:
+            row.append(banner[1] if banner is not None else "")
+        self.writer.writerow(row)
+        self.stream.flush()
+
+    def done(self, idx, ip, port_display, heading, open_ports, banners=None):
+        pass
+
+    def diff(self, idx, ip, port_display, opened, closed):
+        for port, change in [(p, "opened") for p in opened] + [(p, "closed") for p in closed]:
+            self.writer.writerow([ip, port, get_service_port(port), change, timestamp()])
+        self.stream.flush()
+
+    #Rows are per port, so a host with no ports to report gets none
+    def unreachable(self, idx, ip, port_display, heading):
+        pass
+
+WRITERS = {"text": TextWriter, "jsonl": JsonlWriter, "csv": CsvWriter}
+
+#Function to build the writer for an output format- diff writers report opened/closed ports instead of open ones,
+#and with banners the jsonl and csv records get a banner field
+def make_writer(fmt, stream, diff=False, banners=False):
+    return WRITERS[fmt](stream, diff, banners)
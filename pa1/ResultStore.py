@@ -0,0 +1,113 @@
+import json
+import math
+import random
+import sqlite3
+import time
+
+from Checkpoint import port_runs
+from Targets import subtract_intervals
+
+#Function to parse a duration such as "90", "30m", "24h" or "7d" into seconds
+def parse_duration(text):
+    units = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+    text = text.strip().lower()
+    if text and text[-1] in units:
+        return float(text[:-1]) * units[text[-1]]
+    return float(text)
+
+#Local SQLite store of the last known state of every (host, port) that has ever been seen open,
+#plus when each host last had its ports fully swept and which ports that sweep covered
+class ResultStore():
+    def __init__(self, path, commit_every=2.0):
+        self.db = sqlite3.connect(path)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute("""CREATE TABLE IF NOT EXISTS ports (
+            host TEXT NOT NULL, port INTEGER NOT NULL, state TEXT NOT NULL,
+            last_seen REAL NOT NULL, last_checked REAL NOT NULL,
+            PRIMARY KEY (host, port)) WITHOUT ROWID""")
+        self.db.execute("""CREATE TABLE IF NOT EXISTS hosts (
+            host TEXT PRIMARY KEY, last_sweep REAL NOT NULL, ports TEXT NOT NULL DEFAULT '[]') WITHOUT ROWID""")
+        #Stores from before sweeps recorded their ports- an old sweep covers nothing, so its host is swept again
+        if "ports" not in [row[1] for row in self.db.execute("PRAGMA table_info(hosts)")]:
+            self.db.execute("ALTER TABLE hosts ADD COLUMN ports TEXT NOT NULL DEFAULT '[]'")
+        self.commit_every = commit_every
+        self.last_commit = time.monotonic()
+
+    #Function to get the ports of a host that were open the last time they were checked
+    def known_open(self, ip):
+        return [row[0] for row in self.db.execute("SELECT port FROM ports WHERE host = ? AND state = 'open' ORDER BY port", (ip,))]
+
+    #Function to get when a host was last swept over all of the given ports- 0 if never
+    def last_sweep(self, ip, ports):
+        row = self.db.execute("SELECT last_sweep, ports FROM hosts WHERE host = ?", (ip,)).fetchone()
+        if not row:
+            return 0.0
+        covered = [tuple(run) for run in json.loads(row[1])]
+        for lo, hi in port_runs(sorted(ports)):
+            if subtract_intervals(lo, hi, covered):
+                return 0.0
+        return row[0]
+
+    #Function to record what one scan of a host found- open ports, and known-open ports that were checked and no longer answer
+    #swept is the ports of a full sweep of the host, every one of them with a result- None when it was not one
+    def update(self, ip, open_ports, closed_ports, swept=None, now=None):
+        now = time.time() if now is None else now
+        self.db.executemany("""INSERT INTO ports (host, port, state, last_seen, last_checked) VALUES (?, ?, 'open', ?, ?)
+            ON CONFLICT (host, port) DO UPDATE SET state = 'open', last_seen = excluded.last_seen, last_checked = excluded.last_checked""",
+            [(ip, port, now, now) for port in open_ports])
+        self.db.executemany("UPDATE ports SET state = 'closed', last_checked = ? WHERE host = ? AND port = ?",
+            [(now, ip, port) for port in closed_ports])
+        #Only the newest sweep is kept- after a narrower one the next --diff over more ports sweeps the host again
+        if swept:
+            runs = json.dumps(port_runs(sorted(swept)))
+            self.db.execute("""INSERT INTO hosts (host, last_sweep, ports) VALUES (?, ?, ?)
+                ON CONFLICT (host) DO UPDATE SET last_sweep = excluded.last_sweep, ports = excluded.ports""", (ip, now, runs))
+        #Commit in batches- one commit per host would make the store the slowest part of the scan
+        if time.monotonic() - self.last_commit >= self.commit_every:
+            self.db.commit()
+            self.last_commit = time.monotonic()
+
+    def close(self):
+        self.db.commit()
+        self.db.close()
+
+#Wraps a stream of scan jobs to keep the result store up to date. In diff mode each target is cut down to its
+#known-open ports plus a random sample of the rest (or all of the rest once the host's last sweep is older than
+#the staleness window), and only the ports that opened or closed since the last run are reported
+class IncrementalScan():
+    def __init__(self, store, on_done, on_diff=None, stale_after=7 * 86400, sample=0.05, seed=None):
+        self.store = store
+        self.outer_done = on_done
+        self.outer_diff = on_diff #Set for diff mode
+        self.stale_after = stale_after
+        self.sample = sample
+        self.random = random.Random(seed)
+        self.targets = {} # idx -> (ip, ports scanned, known-open ports, full sweep)
+
+    #Function to pick which ports of each target to scan
+    def jobs(self, jobs):
+        now = time.time()
+        for idx, (ip, ports) in enumerate(jobs):
+            wanted = set(ports) if isinstance(ports, list) else ports
+            known = [port for port in self.store.known_open(ip) if port in wanted] #Only what this target covers
+            if self.outer_diff is None or now - self.store.last_sweep(ip, ports) >= self.stale_after:
+                self.targets[idx] = (ip, ports, known, True)
+                yield ip, ports
+                continue
+            rest = ports if isinstance(ports, (list, range)) else list(ports)
+            picked = self.random.sample(rest, min(len(rest), math.ceil(len(rest) * self.sample))) if self.sample > 0 else []
+            scan = sorted(set(known).union(picked))
+            self.targets[idx] = (ip, scan, known, False)
+            yield ip, scan
+
+    def on_done(self, idx, open_ports):
+        ip, scanned, known, swept = self.targets.pop(idx)
+        open_set = set(open_ports)
+        closed = [port for port in known if port not in open_set]
+        self.store.update(ip, open_ports, closed, scanned if swept else None)
+        if self.outer_diff is None:
+            self.outer_done(idx, open_ports)
+            return
+        known_set = set(known)
+        self.outer_diff(idx, [port for port in open_ports if port not in known_set], closed)
@@ -0,0 +1,189 @@
+import asyncio
+import errno
+import select
+import socket
+
+from HostTimeouts import HostTimeouts
+from Pacing import AimdLimiter
+
+#Outcomes of one connect attempt
+OPEN, CLOSED, TIMEOUT, UNREACHABLE = "open", "closed", "timeout", "unreachable"
+
+#Function to raise the open file limit so thousands of sockets can be in flight at once
+#Returns the soft limit now in force, or None if there is no limit
+def raise_fd_limit(wanted):
+    try:
+        import resource
+    except ImportError: #Unix only- elsewhere there is no limit to raise
+        return None
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    wanted = wanted + 64 #Leave room for stdio, output files and the event loop itself
+    if soft == resource.RLIM_INFINITY:
+        return None
+    if soft >= wanted:
+        return soft
+    new_soft = wanted if hard == resource.RLIM_INFINITY else min(wanted, hard)
+    try:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (new_soft, hard))
+    except (ValueError, OSError): #Not allowed to change it- keep what we have
+        return soft
+    return new_soft
+
+#Function to look at a timed-out connect once more- if the event loop was held up past the deadline, the answer may already be in
+#Returns the connect's errno (0 if it completed), or None if it is really still waiting
+def late_error(sock):
+    if hasattr(select, "poll"):
+        poller = select.poll() #Not select.select- descriptors go well past FD_SETSIZE with thousands of sockets open
+        poller.register(sock, select.POLLOUT)
+        if not poller.poll(0):
+            return None
+    else: #No poll() on Windows, where select() has no FD_SETSIZE problem
+        _, writable, failed = select.select([], [sock], [sock], 0)
+        if not writable and not failed:
+            return None
+    return sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+
+#Function to turn a connect's errno (None for no answer in time) into a probe outcome
+def status_of(err):
+    if err is None:
+        return TIMEOUT
+    if err == 0:
+        return OPEN
+    if err == errno.ECONNREFUSED:
+        return CLOSED
+    return UNREACHABLE
+
+#Concurrent TCP connect scanner- keeps up to `concurrency` non-blocking connects in flight on one event loop
+class ScanEngine():
+    def __init__(self, concurrency=1000, timeout=1, timeouts=None, pacer=None, aimd=False, metrics=None):
+        #Without per-host timeouts every connect gets the same fixed timeout, like scan_port
+        self.timeouts = timeouts if timeouts is not None else HostTimeouts(timeout, timeout)
+        limit = raise_fd_limit(int(concurrency))
+        #Never keep more sockets open than the process is allowed to have
+        if limit is not None:
+            concurrency = min(int(concurrency), max(1, limit - 64))
+        self.concurrency = max(1, int(concurrency))
+        self.pacer = pacer #Optional Pacer- global and per-host probes/sec limits
+        self.aimd = aimd   #Back the in-flight limit off when timeouts pile up
+        self.limiter = None
+        self.metrics = metrics #Optional ScanMetrics- every connect's errno and latency
+
+    #Function to perform one non-blocking connect- returns its outcome (OPEN, CLOSED, TIMEOUT or UNREACHABLE) and how long it took
+    async def connect(self, ip, port):
+        loop = asyncio.get_running_loop()
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setblocking(False)
+        if self.metrics is not None:
+            self.metrics.start()
+        start = loop.time()
+        try:
+            await asyncio.wait_for(loop.sock_connect(sock, (ip, port)), self.timeouts.timeout(ip))
+            err = 0
+        except asyncio.TimeoutError:
+            err = late_error(sock)
+        except OSError as e:
+            err = e.errno if e.errno is not None else errno.EIO
+        finally:
+            sock.close()
+        elapsed = loop.time() - start
+        status = status_of(err)
+        if self.metrics is not None:
+            self.metrics.record(ip, err, elapsed)
+        if status == OPEN or status == CLOSED: #A refusal is still a round trip to the host
+            self.timeouts.sample(ip, elapsed)
+        return status, elapsed
+
+    #Function to connect to one port, paced and limited like the rest of the engine
+    async def _probe(self, ip, port):
+        if self.limiter is not None:
+            await self.limiter.acquire()
+        status, elapsed = TIMEOUT, 0.0
+        try:
+            #Reserve the send time only once we hold a slot, so slots freeing up at once can't burst past the rate
+            if self.pacer is not None:
+                wait = self.pacer.delay(ip)
+                if wait > 0:
+                    await asyncio.sleep(wait)
+            status, elapsed = await self.connect(ip, port)
+        finally:
+            if self.limiter is not None:
+                await self.limiter.release(status == TIMEOUT)
+        return status, elapsed
+
+    #Function to probe one port- same answer as scan_port
+    async def probe(self, ip, port):
+        status, _ = await self._probe(ip, port)
+        return status == OPEN
+
+    #Worker coroutine- pulls (target index, position, ip, port) jobs off the shared iterator until it is empty
+    async def _worker(self, jobs, hits, remaining, finish, on_open):
+        for idx, pos, ip, port in jobs:
+            status, elapsed = await self._probe(ip, port)
+            if status == OPEN:
+                hits[idx].append((pos, port))
+                if on_open is not None:
+                    on_open(idx, ip, port, elapsed)
+            remaining[idx] -= 1
+            if remaining[idx] == 0:
+                finish(idx)
+
+    async def scan_many_async(self, targets, on_open=None, on_done=None):
+        results = {}
+        if on_done is None:
+            on_done = results.__setitem__
+        hits = {}      # idx -> [(position, port)] of targets still being scanned
+        remaining = {} # idx -> probes of that target not yet answered
+
+        #Function to hand a finished target's open ports on- answers arrive in any order, so put them back in the order they were asked for
+        def finish(idx):
+            del remaining[idx]
+            on_done(idx, [port for _, port in sorted(hits.pop(idx))])
+
+        #One lazy job stream shared by every worker so the pool stays full across target boundaries
+        def job_stream():
+            for idx, (ip, ports) in enumerate(targets):
+                hits[idx] = []
+                remaining[idx] = len(ports)
+                if not remaining[idx]:
+                    finish(idx)
+                for pos, port in enumerate(ports):
+                    yield idx, pos, ip, port
+
+        if self.aimd:
+            self.limiter = AimdLimiter(self.concurrency)
+        jobs = job_stream()
+        workers = [self._worker(jobs, hits, remaining, finish, on_open) for _ in range(self.concurrency)]
+        await asyncio.gather(*workers)
+        return [results[idx] for idx in range(len(results))]
+
+    #Function to scan a list of (ip, ports) targets- returns the open ports of each target in order
+    #If callbacks are given, on_open(idx, ip, port, latency) fires for every open port as it is found and
+    #on_done(idx, open_ports) as soon as a target finishes- the results are then handed over instead of kept
+    def scan_many(self, targets, on_open=None, on_done=None):
+        return asyncio.run(self.scan_many_async(targets, on_open, on_done))
+
+    #Function to scan one target- returns its open ports
+    def scan(self, ip, ports, on_open=None):
+        return self.scan_many([(ip, ports)], on_open)[0]
+
+    async def live_hosts_async(self, hosts, ports):
+        alive = set()
+        jobs = ((ip, port) for ip in hosts for port in ports)
+
+        #Worker coroutine- a host is alive as soon as any port connects or is refused, so its other probes are skipped
+        async def worker():
+            for ip, port in jobs:
+                if ip in alive:
+                    continue
+                status, _ = await self._probe(ip, port)
+                if status == OPEN or status == CLOSED:
+                    alive.add(ip)
+
+        if self.aimd:
+            self.limiter = AimdLimiter(self.concurrency)
+        await asyncio.gather(*[worker() for _ in range(self.concurrency)])
+        return alive
+
+    #Function to find which hosts answer (connect or refuse) on at least one of a few ports
+    def live_hosts(self, hosts, ports):
+        return asyncio.run(self.live_hosts_async(list(hosts), list(ports)))
@@ -0,0 +1,61 @@
+import array
+
+#Where the system keeps its services database
+DEFAULT_PATHS = ["/etc/services", r"C:\Windows\System32\drivers\etc\services"]
+
+#Port -> service name table loaded once from a services file, so naming a port is a single index lookup
+class ServiceTable():
+    def __init__(self, path=None, proto="tcp"):
+        self.names = [""] #Every distinct service name once- slot 0 means "no name"
+        self.index = array.array('H', bytes(2 * 65536)) #port -> slot in names, 128KB for the whole port space
+        self.source = None
+        for candidate in ([path] if path else DEFAULT_PATHS):
+            try:
+                with open(candidate, "r", encoding="utf-8", errors="replace") as file:
+                    self._load(file, proto)
+            except OSError:
+                if path: #A file the user asked for has to exist
+                    raise
+                continue
+            self.source = candidate
+            break
+
+    #Function to read "name port/proto [aliases] [# comment]" lines- the first name listed for a port wins, like getservbyport
+    def _load(self, lines, proto):
+        slots = {}
+        for line in lines:
+            parts = line.split('#', 1)[0].split()
+            if len(parts) < 2:
+                continue
+            port, _, entry_proto = parts[1].partition('/')
+            if entry_proto != proto or not port.isdigit():
+                continue
+            port = int(port)
+            if port > 65535 or self.index[port]:
+                continue
+            name = parts[0]
+            slot = slots.get(name)
+            if slot is None:
+                slot = slots[name] = len(self.names)
+                self.names.append(name)
+            self.index[port] = slot
+
+    #Function to get the service name of a port- "" if there is none
+    def name(self, port):
+        if 0 <= port <= 65535:
+            return self.names[self.index[port]]
+        return ""
+
+_table = None
+
+#Function to load the services table used by get_service_port- the system database unless a file is given
+def load_services(path=None):
+    global _table
+    _table = ServiceTable(path)
+    return _table
+
+#Function to retrieve port number and service name associated
+def get_service_port(port):
+    if _table is None: #Load the system table on first use
+        load_services()
+    return _table.name(port)
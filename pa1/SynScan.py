@@ -0,0 +1,239 @@
+import errno
+import heapq
+import os
+import select
+import socket
+import struct
+import sys
+import time
+import zlib
+
+from HostTimeouts import HostTimeouts
+from ScanEngine import CLOSED, OPEN, TIMEOUT, UNREACHABLE
+
+SYN_WINDOW = 1000  #Probes in flight when no --concurrency is given
+SYN_RETRIES = 1    #Extra SYNs sent to a silent port before it counts as filtered- one lost packet is not a filtered port
+RECV_BUFFER = 4 << 20
+ROUTE_CACHE = 65536
+
+TCP_HEADER = struct.Struct("!HHIIBBHHH") #sport, dport, seq, ack, data offset, flags, window, checksum, urgent
+TCP_REPLY = struct.Struct("!HHII")       #sport, dport, seq, ack of a received segment
+SYN, RST, ACK = 0x02, 0x04, 0x10
+
+#Function to compute the internet checksum (RFC 1071) of some bytes
+def checksum(data):
+    if len(data) % 2:
+        data += b"\0"
+    total = sum(struct.unpack(f"!{len(data) // 2}H", data))
+    while total >> 16:
+        total = (total & 0xFFFF) + (total >> 16)
+    return ~total & 0xFFFF
+
+#Function to build a bare SYN segment- the kernel adds the IP header, the checksum covers the pseudo-header too
+def syn_segment(src, dst, sport, dport, seq):
+    header = TCP_HEADER.pack(sport, dport, seq, 0, 5 << 4, SYN, 1024, 0, 0)
+    pseudo = src + dst + struct.pack("!BBH", 0, socket.IPPROTO_TCP, len(header))
+    return header[:16] + struct.pack("!H", checksum(pseudo + header)) + header[18:]
+
+#Function to tell whether this machine can send raw TCP segments- Linux only, and needs root or CAP_NET_RAW
+def syn_supported():
+    if not sys.platform.startswith("linux"):
+        return False
+    try:
+        socket.socket(socket.AF_INET, socket.SOCK_RAW, socket.IPPROTO_TCP).close()
+    except PermissionError:
+        return False
+    return True
+
+#Half-open (SYN) scanner- sends SYNs from one raw socket and reads every SYN-ACK and RST back from another,
+#so no connection is ever completed: the kernel answers each SYN-ACK with a RST because no socket owns our port
+#A probe is matched to its reply by the sequence number it carried (a keyed hash of host and port), so
+#nothing per port has to be remembered beyond the probes that are still in flight
+class SynEngine():
+    def __init__(self, concurrency=SYN_WINDOW, timeout=1, timeouts=None, pacer=None, retries=SYN_RETRIES, metrics=None):
+        self.timeouts = timeouts if timeouts is not None else HostTimeouts(timeout, timeout)
+        self.concurrency = max(1, int(concurrency))
+        self.pacer = pacer
+        self.retries = retries
+        self.secret = os.urandom(8)
+        self.routes = {} # destination -> (packed source address, packed destination address)
+        self.metrics = metrics #Optional ScanMetrics- a SYN-ACK counts as a completed connect and a RST as a refusal
+
+    #Function to get the source and destination addresses for a host- the source is whatever the routing table picks
+    def _route(self, ip):
+        route = self.routes.get(ip)
+        if route is None:
+            dst = socket.gethostbyname(ip)
+            probe = socket.socket(socket.AF_INET, socket.SOCK_DGRAM) #connect() on UDP sends nothing, it only picks the route
+            try:
+                probe.connect((dst, 9))
+                src = probe.getsockname()[0]
+            finally:
+                probe.close()
+            if len(self.routes) >= ROUTE_CACHE:
+                self.routes.clear()
+            route = self.routes[ip] = (socket.inet_aton(src), socket.inet_aton(dst))
+        return route
+
+    #Function to get the sequence number a probe carries- replies acknowledge it plus one
+    def _cookie(self, dst, port):
+        return zlib.crc32(self.secret + dst + port.to_bytes(2, "big"))
+
+    #Function to run a stream of (key, ip, port) probes- on_answer(key, status, elapsed) is called once per probe
+    def _run(self, probes, on_answer):
+        send = socket.socket(socket.AF_INET, socket.SOCK_RAW, socket.IPPROTO_TCP)
+        recv = socket.socket(socket.AF_INET, socket.SOCK_RAW, socket.IPPROTO_TCP)
+        #Bound but never listening- reserves our source port so no other program gets its SYN-ACKs
+        anchor = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        try:
+            recv.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, RECV_BUFFER)
+            recv.setblocking(False)
+            anchor.bind(("", 0))
+            sport = anchor.getsockname()[1]
+            inflight = {} # (packed dst, port) -> [key, ip, sent time, tries, packed src]
+            deadlines = [] # heap of (deadline, packed dst, port, tries)
+
+            #Function to send (or resend) one probe
+            def transmit(entry, dst, port):
+                now = time.monotonic()
+                send.sendto(syn_segment(entry[4], dst, sport, port, self._cookie(dst, port)), (socket.inet_ntoa(dst), 0))
+                entry[2] = now
+                entry[3] += 1
+                heapq.heappush(deadlines, (now + self.timeouts.timeout(entry[1]), dst, port, entry[3]))
+
+            #Function to read every reply waiting on the receive socket, for up to `wait` seconds
+            def drain(wait):
+                ready, _, _ = select.select([recv], [], [], max(0.0, wait))
+                while ready:
+                    try:
+                        packet = recv.recv(128)
+                    except BlockingIOError:
+                        return
+                    ihl = (packet[0] & 0x0F) * 4
+                    if len(packet) < ihl + 14:
+                        continue
+                    rport, dport, _, ack = TCP_REPLY.unpack_from(packet, ihl)
+                    flags = packet[ihl + 13]
+                    if dport != sport or not flags & (SYN | RST):
+                        continue #Our own outgoing segments, or traffic for somebody else
+                    probe = (packet[12:16], rport)
+                    entry = inflight.get(probe)
+                    if entry is None or ack != (self._cookie(*probe) + 1) & 0xFFFFFFFF:
+                        continue
+                    del inflight[probe]
+                    elapsed = time.monotonic() - entry[2]
+                    self.timeouts.sample(entry[1], elapsed)
+                    accepted = flags & SYN and flags & ACK
+                    if self.metrics is not None:
+                        self.metrics.record(entry[1], 0 if accepted else errno.ECONNREFUSED, elapsed)
+                    on_answer(entry[0], OPEN if accepted else CLOSED, elapsed)
+
+            #Function to retry or give up on probes whose reply is overdue
+            def expire():
+                now = time.monotonic()
+                while deadlines and deadlines[0][0] <= now:
+                    _, dst, port, tries = heapq.heappop(deadlines)
+                    entry = inflight.get((dst, port))
+                    if entry is None or entry[3] != tries: #Answered, or already resent
+                        continue
+                    if tries <= self.retries:
+                        transmit(entry, dst, port)
+                    else:
+                        del inflight[(dst, port)]
+                        if self.metrics is not None:
+                            self.metrics.record(entry[1], None, now - entry[2])
+                        on_answer(entry[0], TIMEOUT, now - entry[2])
+
+            for key, ip, port in probes:
+                while len(inflight) >= self.concurrency:
+                    drain(deadlines[0][0] - time.monotonic() if deadlines else 0.01)
+                    expire()
+                try:
+                    src, dst = self._route(ip)
+                except OSError as e: #Unresolvable or unroutable host
+                    if self.metrics is not None:
+                        self.metrics.start()
+                        self.metrics.record(ip, e.errno, 0.0)
+                    on_answer(key, UNREACHABLE, 0.0)
+                    continue
+                while (dst, port) in inflight: #Same host and port listed twice- wait for the first probe, replies can't tell them apart
+                    drain(deadlines[0][0] - time.monotonic())
+                    expire()
+                if self.pacer is not None:
+                    wait = self.pacer.delay(ip)
+                    until = time.monotonic() + wait
+                    while wait > 0: #Keep reading replies while the pacer holds this probe back
+                        drain(wait)
+                        expire()
+                        wait = until - time.monotonic()
+                entry = inflight[(dst, port)] = [key, ip, 0.0, 0, src]
+                if self.metrics is not None:
+                    self.metrics.start()
+                try:
+                    transmit(entry, dst, port)
+                except OSError as e:
+                    del inflight[(dst, port)]
+                    if self.metrics is not None:
+                        self.metrics.record(ip, e.errno, 0.0)
+                    on_answer(key, UNREACHABLE, 0.0)
+                    continue
+                drain(0)
+                expire()
+            while inflight:
+                drain(deadlines[0][0] - time.monotonic() if deadlines else 0.01)
+                expire()
+        finally:
+            anchor.close()
+            recv.close()
+            send.close()
+
+    #Function to scan a list of (ip, ports) targets- same callbacks and result as ScanEngine.scan_many
+    def scan_many(self, targets, on_open=None, on_done=None):
+        results = {}
+        if on_done is None:
+            on_done = results.__setitem__
+        hits = {}      # idx -> [(position, port)] of targets still being scanned
+        remaining = {} # idx -> probes of that target not yet answered
+
+        def finish(idx):
+            del remaining[idx]
+            on_done(idx, [port for _, port in sorted(hits.pop(idx))])
+
+        def probes():
+            for idx, (ip, ports) in enumerate(targets):
+                hits[idx] = []
+                remaining[idx] = len(ports)
+                if not remaining[idx]:
+                    finish(idx)
+                for pos, port in enumerate(ports):
+                    yield (idx, pos, ip, port), ip, port
+
+        def on_answer(key, status, elapsed):
+            idx, pos, ip, port = key
+            if status == OPEN:
+                hits[idx].append((pos, port))
+                if on_open is not None:
+                    on_open(idx, ip, port, elapsed)
+            remaining[idx] -= 1
+            if remaining[idx] == 0:
+                finish(idx)
+
+        self._run(probes(), on_answer)
+        return [results[idx] for idx in range(len(results))]
+
+    #Function to scan one target- returns its open ports
+    def scan(self, ip, ports, on_open=None):
+        return self.scan_many([(ip, ports)], on_open)[0]
+
+    #Function to find which hosts answer (SYN-ACK or RST) on at least one of a few ports
+    def live_hosts(self, hosts, ports):
+        alive = set()
+        ports = list(ports)
+        probes = ((ip, ip, port) for ip in list(hosts) for port in ports if ip not in alive)
+
+        def on_answer(ip, status, elapsed):
+            if status == OPEN or status == CLOSED:
+                alive.add(ip)
+
+        self._run(probes, on_answer)
+        return alive
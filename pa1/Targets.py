@@ -0,0 +1,149 @@
+import ipaddress
+import socket
+import sys
+from bisect import bisect_right
+
+IPV4_END = 1 << 32 #One past the last IPv4 address
+
+#Function to merge the port interval lo-hi into a sorted tuple of disjoint (lo, hi) intervals
+def merge_interval(covered, lo, hi):
+    merged = []
+    for c_lo, c_hi in covered:
+        if c_hi + 1 < lo or hi + 1 < c_lo: #No overlap and not touching- keep as is
+            merged.append((c_lo, c_hi))
+        else:
+            lo, hi = min(lo, c_lo), max(hi, c_hi)
+    merged.append((lo, hi))
+    return tuple(sorted(merged))
+
+#Function to get what is left of the port interval lo-hi once the covered intervals are taken out
+def subtract_intervals(lo, hi, covered):
+    remaining = []
+    for c_lo, c_hi in covered:
+        if c_hi < lo or c_lo > hi:
+            continue
+        if c_lo > lo:
+            remaining.append((lo, c_lo - 1))
+        lo = max(lo, c_hi + 1)
+        if lo > hi:
+            return remaining
+    remaining.append((lo, hi))
+    return remaining
+
+#Index over the whole IPv4 space of which port intervals have already been queued for each host
+#Stored as sorted, disjoint host segments that each carry one merged port-interval tuple, so memory grows
+#with the number of input lines rather than the number of hosts they expand to
+class HostIntervalIndex():
+    def __init__(self):
+        self.starts = [0]      #First host of each segment- a segment runs until the next one starts
+        self.covered = [()]    #Port intervals already queued for every host of that segment
+        self.names = {}        #Hostnames that are not IP literals -> their port intervals
+
+    #Function to make sure a segment starts exactly at host
+    def _split(self, host):
+        if host >= IPV4_END:
+            return len(self.starts)
+        i = bisect_right(self.starts, host) - 1
+        if self.starts[i] == host:
+            return i
+        self.starts.insert(i + 1, host)
+        self.covered.insert(i + 1, self.covered[i])
+        return i + 1
+
+    #Function to get the (first host, last host, covered ports) pieces that make up hosts lo-hi
+    def pieces(self, lo, hi):
+        out = []
+        i = bisect_right(self.starts, lo) - 1
+        while i < len(self.starts) and self.starts[i] <= hi:
+            seg_end = self.starts[i + 1] - 1 if i + 1 < len(self.starts) else IPV4_END - 1
+            out.append((max(lo, self.starts[i]), min(hi, seg_end), self.covered[i]))
+            i += 1
+        return out
+
+    #Function to record that ports port_lo-port_hi are queued for every host from lo to hi
+    def add(self, lo, hi, port_lo, port_hi):
+        first = self._split(lo)
+        end = self._split(hi + 1)
+        for i in range(first, end):
+            self.covered[i] = merge_interval(self.covered[i], port_lo, port_hi)
+        #Fold neighbouring segments that ended up identical back together so the index stays small
+        i = max(1, first)
+        while i < len(self.starts) and i <= end:
+            if self.covered[i] == self.covered[i - 1]:
+                del self.starts[i], self.covered[i]
+                end -= 1
+            else:
+                i += 1
+
+#Function to parse the host column of an input line- an IP, a CIDR block (10.0.0.0/24) or a range
+#(10.0.0.1-10.0.0.50 or 10.0.0.1-50). Returns (first, last) as integers, or None for a plain hostname- a dash
+#only makes a range when an IPv4 address comes before it, so hyphenated hostnames (my-host.example.com) stay names
+def parse_hosts(spec):
+    if '/' in spec:
+        net = ipaddress.IPv4Network(spec, strict=False)
+        return int(net.network_address), int(net.broadcast_address)
+    first, dash, last = spec.partition('-')
+    if dash and is_ipv4(first):
+        lo = int(ipaddress.IPv4Address(first))
+        if last.isdigit(): #Shorthand for the last octet, e.g. 10.0.0.1-50
+            hi = (lo & ~0xFF) | int(last)
+            if int(last) > 255:
+                raise ValueError(f"bad host range: {spec}")
+        else:
+            hi = int(ipaddress.IPv4Address(last))
+        if hi < lo:
+            raise ValueError(f"bad host range: {spec}")
+        return lo, hi
+    try:
+        host = int(ipaddress.IPv4Address(spec))
+    except ValueError:
+        return None
+    return host, host
+
+def is_ipv4(text):
+    try:
+        ipaddress.IPv4Address(text)
+    except ValueError:
+        return False
+    return True
+
+#Function to read "<hosts> \t <port start> \t <port end>" lines and lazily yield (ip, [(port lo, port hi), ...])
+#for every host they expand to- ports already queued for a host by an earlier line are left out, and a host
+#with nothing left to scan is skipped, so each (host, port) pair comes out at most once
+def read_targets(filename):
+    index = HostIntervalIndex()
+    with open(filename, "r") as file:
+        for line in file:
+            line = line.strip()
+            if not line:
+                continue
+            parts = line.split('\t') #Split line into 3 parts based on tab spaces in file
+            try:
+                spec, port_start, port_end = parts
+                port_start = int(port_start)
+                port_end = int(port_end)
+                if not 1 <= port_start <= port_end <= 65535:
+                    raise ValueError
+                hosts = parse_hosts(spec.strip())
+            except ValueError: #Skips any invalid line, but says so
+                print(f"Warning: skipping invalid target line: {line!r}", file=sys.stderr)
+                continue
+
+            if hosts is None: #Hostname- tracked by name
+                name = spec.strip()
+                covered = index.names.get(name, ())
+                index.names[name] = merge_interval(covered, port_start, port_end)
+                remaining = subtract_intervals(port_start, port_end, covered)
+                if remaining:
+                    yield name, remaining
+                continue
+
+            #Snapshot what earlier lines covered before this line is added, then expand one host at a time
+            pieces = index.pieces(*hosts)
+            index.add(hosts[0], hosts[1], port_start, port_end)
+            for first, last, covered in pieces:
+                remaining = subtract_intervals(port_start, port_end, covered)
+                if not remaining:
+                    continue
+                for host in range(first, last + 1):
+                    yield socket.inet_ntoa(host.to_bytes(4, "big")), remaining
@@ -0,0 +1,195 @@
+import argparse
+import json
+import multiprocessing
+import platform
+import resource
+import selectors
+import socket
+import sys
+import threading
+import time
+
+import PortScanner
+from HostTimeouts import HostTimeouts
+from ScanEngine import ScanEngine
+from SynScan import SynEngine
+
+IP = "127.0.0.1"
+ENGINES = ["serial", "input", "engine", "workers", "syn"]
+DEFAULT_ENGINES = ENGINES[:4] #syn needs root or CAP_NET_RAW, so it only runs when asked for
+
+#Loopback stand-ins for the three kinds of port a real scan meets- no iptables needed:
+# open:       listening socket whose connections are accepted and closed by a background thread
+# closed:     bound but not listening, so the kernel answers with a RST (connection refused)
+# blackholed: listen(0) with its single backlog slot already taken, so further SYNs are silently dropped
+class Listeners():
+    def __init__(self, n_open, n_closed, n_blackholed):
+        self.sockets = []
+        self.fillers = []
+        self.open_ports = [self._bind(listen=True) for _ in range(n_open)]
+        self.closed_ports = [self._bind(listen=False) for _ in range(n_closed)]
+        self.blackholed_ports = [self._blackhole() for _ in range(n_blackholed)]
+        self.selector = selectors.DefaultSelector()
+        for sock in self.sockets[:n_open]:
+            sock.setblocking(False)
+            self.selector.register(sock, selectors.EVENT_READ)
+        self.running = True
+        threading.Thread(target=self._accept_loop, daemon=True).start()
+
+    #Function to bind a loopback socket on a free port (and optionally listen on it)
+    def _bind(self, listen):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.bind((IP, 0))
+        if listen:
+            sock.listen(1024)
+        self.sockets.append(sock)
+        return sock.getsockname()[1]
+
+    #Function to build a port that drops SYNs- its one backlog slot is filled by a connection nobody accepts
+    def _blackhole(self):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.bind((IP, 0))
+        sock.listen(0)
+        port = sock.getsockname()[1]
+        filler = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        filler.connect((IP, port))
+        self.sockets.append(sock)
+        self.fillers.append(filler)
+        return port
+
+    #Accept and drop every connection to the open ports so their backlogs never fill up
+    def _accept_loop(self):
+        while self.running:
+            for key, _ in self.selector.select(timeout=0.1):
+                try:
+                    conn, _ = key.fileobj.accept()
+                    conn.close()
+                except OSError:
+                    pass
+
+    #Function to get every port of the mix in ascending order
+    def all_ports(self):
+        return sorted(self.open_ports + self.closed_ports + self.blackholed_ports)
+
+    def close(self):
+        self.running = False
+        for sock in self.sockets + self.fillers:
+            sock.close()
+
+#Function to get the q-th percentile of a sorted list of numbers
+def percentile(values, q):
+    if not values:
+        return None
+    return values[min(len(values) - 1, int(round(q / 100 * (len(values) - 1))))]
+
+#Engine that keeps every probe's connect latency
+class TimedEngine(ScanEngine):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.latencies = []
+
+    async def connect(self, ip, port):
+        status, elapsed = await super().connect(ip, port)
+        self.latencies.append(elapsed)
+        return status, elapsed
+
+#Function to run one engine over the listener ports- runs in its own process so peak RSS belongs to that engine alone
+def run_case(name, ports, timeout, concurrency, workers, queue):
+    latencies = []
+    timeouts = HostTimeouts(timeout, timeout) #Fixed timeout so every engine waits out blackholed ports the same way
+    scanned = len(ports)
+    start = time.perf_counter()
+    if name in ("serial", "input"):
+        #Time every scan_port call made by the classic functions
+        scan_port = PortScanner.scan_port
+        def timed_scan_port(ip, port, _timeouts=None, _metrics=None):
+            t = time.perf_counter()
+            result = scan_port(ip, port, timeouts)
+            latencies.append(time.perf_counter() - t)
+            return result
+        PortScanner.scan_port = timed_scan_port
+        if name == "serial":
+            lines = PortScanner.scan_target(IP, ports, "benchmark")
+        else: #scan_targets_input only takes a contiguous range, so it sweeps from the lowest to the highest port of the mix
+            lines = PortScanner.scan_targets_input(IP, ports[0], ports[-1])
+            scanned = ports[-1] - ports[0] + 1
+        found = [int(line.split()[1].rstrip(':')) for line in lines if line.startswith("Port ")]
+    elif name == "engine":
+        engine = TimedEngine(concurrency, timeouts=timeouts)
+        found = engine.scan(IP, ports)
+        latencies = engine.latencies
+    elif name == "syn": #Replies are matched off one raw socket, so there is no per-probe latency to time
+        found = SynEngine(concurrency, timeouts=timeouts).scan(IP, ports)
+    else: #Per-probe latency stays inside the worker processes
+        found = PortScanner.scan_jobs([(IP, ports)], workers=workers, concurrency=concurrency, timeouts=timeouts)[0]
+    seconds = time.perf_counter() - start
+    latencies.sort()
+    p50, p99 = percentile(latencies, 50), percentile(latencies, 99)
+    queue.put({
+        "engine": name,
+        "ports": scanned,
+        "seconds": round(seconds, 4),
+        "ports_per_sec": round(scanned / seconds, 1) if seconds > 0 else None,
+        "p50_ms": round(p50 * 1000, 3) if p50 is not None else None,
+        "p99_ms": round(p99 * 1000, 3) if p99 is not None else None,
+        "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, #Kilobytes on Linux
+        "open_found": found,
+    })
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the port scanner against loopback stand-in listeners")
+    parser.add_argument("--open", type=int, default=50, help="number of open ports")
+    parser.add_argument("--closed", type=int, default=900, help="number of closed (refusing) ports")
+    parser.add_argument("--blackholed", type=int, default=50, help="number of blackholed (silently dropping) ports")
+    parser.add_argument("--timeout", type=float, default=0.2, help="fixed connect timeout in seconds")
+    parser.add_argument("--concurrency", type=int, default=1000, help="in-flight connects for the engine and workers cases")
+    parser.add_argument("--workers", type=int, default=4, help="processes for the workers case")
+    parser.add_argument("--engines", type=str, default=",".join(DEFAULT_ENGINES), help=f"comma-separated subset of {','.join(ENGINES)}")
+    parser.add_argument("--output", type=str, default="benchmark.json", help="machine-readable results file")
+    args = parser.parse_args()
+
+    engines = [name.strip() for name in args.engines.split(',') if name.strip()]
+    unknown = [name for name in engines if name not in ENGINES]
+    if unknown:
+        print(f"Error: unknown engine(s): {', '.join(unknown)}")
+        sys.exit(1)
+
+    listeners = Listeners(args.open, args.closed, args.blackholed)
+    ports = listeners.all_ports()
+    expected = sorted(listeners.open_ports)
+    in_mix = set(ports)
+    results = []
+    try:
+        ctx = multiprocessing.get_context("fork")
+        for name in engines:
+            queue = ctx.Queue()
+            proc = ctx.Process(target=run_case, args=(name, ports, args.timeout, args.concurrency, args.workers, queue))
+            proc.start()
+            result = queue.get()
+            proc.join()
+            #Ports that are not part of the mix (only swept by "input") may be open on this machine too
+            result["correct"] = [port for port in result.pop("open_found") if port in in_mix] == expected
+            results.append(result)
+            p50 = "-" if result["p50_ms"] is None else f"{result['p50_ms']}ms"
+            p99 = "-" if result["p99_ms"] is None else f"{result['p99_ms']}ms"
+            print(f"{name:8s} {result['ports']:6d} ports {result['seconds']:8.3f}s {result['ports_per_sec'] or 0:10.1f} ports/sec "
+                  f"p50={p50} p99={p99} rss={result['peak_rss_kb']}KB correct={result['correct']}")
+    finally:
+        listeners.close()
+
+    report = {
+        "timestamp": time.time(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "mix": {"open": args.open, "closed": args.closed, "blackholed": args.blackholed},
+        "timeout": args.timeout,
+        "concurrency": args.concurrency,
+        "workers": args.workers,
+        "results": results,
+    }
+    with open(args.output, "w") as outfile:
+        json.dump(report, outfile, indent=2)
+    print(f"Results written to {args.output}")
+
+if __name__ == "__main__":
+    main()
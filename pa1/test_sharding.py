@@ -0,0 +1,43 @@
+import asyncio
+import random
+import socket
+import unittest
+from unittest import mock
+
+import PortScanner
+from ScanEngine import ScanEngine
+
+#Sharded scans with an engine in every worker- the open ports of a job have to come back in port order however the connects finish
+class ShardOrderTest(unittest.TestCase):
+    def setUp(self):
+        self.listeners = []
+        for _ in range(12):
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            sock.bind(("127.0.0.1", 0))
+            sock.listen(16)
+            self.listeners.append(sock)
+        self.ports = sorted(sock.getsockname()[1] for sock in self.listeners)
+
+    def tearDown(self):
+        for sock in self.listeners:
+            sock.close()
+
+    def test_ports_come_back_in_order_under_random_delays(self):
+        connect = ScanEngine.connect
+
+        #Hold every connect up a random while so ports answer out of order
+        async def slow_connect(engine, ip, port):
+            await asyncio.sleep(random.uniform(0, 0.05))
+            return await connect(engine, ip, port)
+
+        #Scan the listeners plus the closed ports between them, a few at a time per shard so a job spans several shards
+        wanted = sorted(set(self.ports) | set(random.sample(range(self.ports[0], self.ports[-1] + 1), 20)))
+        jobs = [("127.0.0.1", wanted), ("127.0.0.1", list(reversed(wanted)))]
+        with mock.patch.object(ScanEngine, "connect", slow_connect), mock.patch.object(PortScanner, "SHARD_PORTS", 4):
+            for _ in range(3):
+                results = PortScanner.scan_jobs(jobs, workers=2, concurrency=4)
+                self.assertEqual(results[0], self.ports)
+                self.assertEqual(results[1], list(reversed(self.ports))) #Ports come back in the order they were asked for
+
+if __name__ == "__main__":
+    unittest.main()
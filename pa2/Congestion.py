@@ -0,0 +1,62 @@
+INITIAL_RTO = 0.5 # retransmission timeout before the first RTT sample
+MIN_RTO = 0.05    # floor- links here are mostly localhost, so the 1 s floor of RFC 6298 would only slow recovery
+MAX_RTO = 8.0     # ceiling for the backed-off timeout
+
+# TCP-style retransmission timer (RFC 6298): smoothed RTT plus variance, doubled on every timeout until a fresh sample
+class RttEstimator():
+    ALPHA = 1 / 8 # gain for the smoothed RTT
+    BETA = 1 / 4  # gain for the RTT variance
+    K = 4         # variances of slack above the smoothed RTT
+
+    def __init__(self, initial=INITIAL_RTO, floor=MIN_RTO, ceiling=MAX_RTO):
+        self.srtt = None
+        self.rttvar = None
+        self.rto = initial
+        self.floor = floor
+        self.ceiling = ceiling
+        self.backoff = 1
+
+    # fold in one RTT measured on a packet that was only sent once (Karn's rule- a resent packet's ACK is ambiguous)
+    def sample(self, rtt):
+        if self.srtt is None:
+            self.srtt = rtt
+            self.rttvar = rtt / 2
+        else:
+            self.rttvar = (1 - self.BETA) * self.rttvar + self.BETA * abs(self.srtt - rtt)
+            self.srtt = (1 - self.ALPHA) * self.srtt + self.ALPHA * rtt
+        self.rto = min(self.ceiling, max(self.floor, self.srtt + self.K * self.rttvar))
+        self.backoff = 1
+
+    # exponential backoff- every timeout doubles the timer until an ACK brings a new sample
+    def on_timeout(self):
+        self.backoff = min(self.backoff * 2, 64)
+
+    def timeout(self):
+        return min(self.ceiling, self.rto * self.backoff)
+
+# AIMD congestion window in packets: slow start up to ssthresh, then one more packet per window's worth of ACKs,
+# and back to one packet with ssthresh halved whenever a timeout says the link is dropping
+class CongestionWindow():
+    def __init__(self, max_window, initial=1, ssthresh=None):
+        self.max_window = max(1, int(max_window))
+        self.cwnd = float(min(initial, self.max_window))
+        self.ssthresh = float(ssthresh if ssthresh is not None else self.max_window)
+
+    # packets that may be outstanding right now
+    def window(self):
+        return max(1, int(self.cwnd))
+
+    def on_ack(self, acked=1):
+        for _ in range(acked):
+            if self.cwnd < self.ssthresh:
+                self.cwnd += 1                 # slow start- doubles every round trip
+            else:
+                self.cwnd += 1 / self.cwnd     # congestion avoidance- one packet per round trip
+        self.cwnd = min(self.cwnd, float(self.max_window))
+
+    def on_loss(self):
+        self.ssthresh = max(self.cwnd / 2, 2.0)
+        self.cwnd = 1.0
+
+    def in_slow_start(self):
+        return self.cwnd < self.ssthresh
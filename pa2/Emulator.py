@@ -0,0 +1,247 @@
+import argparse
+import contextlib
+import os
+import random
+import time
+
+from Node import DV_QUIET, Node
+from Packet import MTU
+from Routing import INFINITY
+from Runtime import VirtualLoop
+
+BASE_PORT = 20000 # node i listens on BASE_PORT + i
+START_AT = 1.0    # when the last node floods START- same second run(last=True) waits
+
+# one direction of a virtual link: packets are serialized one after another at `bandwidth` bytes/s (None for
+# unlimited), wait in a drop-tail queue of at most `queue` full-size packets while the link is busy, are lost with
+# probability `loss`, and arrive `delay` seconds after they finish going out- so they stay in order
+class VirtualLink():
+    def __init__(self, loss=0.0, delay=0.01, bandwidth=None, queue=64):
+        self.loss = loss
+        self.delay = delay
+        self.bandwidth = bandwidth
+        self.queue = queue * MTU # in bytes
+        self.busy_until = 0.0
+        self.up = True
+        self.packets = 0
+        self.lost = 0
+        self.overflow = 0
+
+# Nodes in one process on a VirtualLoop, joined by virtual links instead of UDP. Every random draw comes from
+# generators seeded from `seed`, and the loop breaks timer ties in scheduling order, so a run is repeatable
+class VirtualNetwork():
+    def __init__(self, loop, seed=0):
+        self.loop = loop
+        self.rng = random.Random(seed) # link losses
+        self.links = {}     # (src port, dst port) -> VirtualLink
+        self.endpoints = {} # port -> on_datagram
+
+    # a link both ways, each direction with its own queue
+    def connect(self, a, b, loss=0.0, delay=0.01, bandwidth=None, queue=64):
+        self.links[(a, b)] = VirtualLink(loss, delay, bandwidth, queue)
+        self.links[(b, a)] = VirtualLink(loss, delay, bandwidth, queue)
+
+    def set_up(self, a, b, up):
+        if (a, b) not in self.links:
+            raise ValueError(f"no link between {a} and {b}")
+        self.links[(a, b)].up = up
+        self.links[(b, a)].up = up
+
+    # transport factory for Node(transport=network.attach)
+    def attach(self, loop, port, on_datagram):
+        if loop is not self.loop:
+            raise ValueError("a node on a virtual network has to run on the network's loop")
+        self.endpoints[port] = on_datagram
+        return VirtualTransport(self, port)
+
+    # a packet with no link to its destination goes nowhere, like a UDP datagram to a port nobody listens on
+    def send(self, src, dst, data):
+        link = self.links.get((src, dst))
+        if link is None or not link.up:
+            return
+        link.packets += 1
+        now = self.loop.time()
+        nbytes = len(data)
+        if link.bandwidth is None:
+            done = now
+        else:
+            start = max(now, link.busy_until)
+            if (start - now) * link.bandwidth + nbytes > link.queue:
+                link.overflow += 1
+                return
+            done = link.busy_until = start + nbytes / link.bandwidth
+        if link.loss and self.rng.random() < link.loss:
+            link.lost += 1
+            return
+        # senders reuse their buffers, so what is in flight has to be a copy
+        self.loop.call_at(done + link.delay, self._arrive, src, dst, bytes(data))
+
+    def _arrive(self, src, dst, data):
+        link = self.links[(src, dst)]
+        on_datagram = self.endpoints.get(dst)
+        if link.up and on_datagram is not None:
+            on_datagram(data, ("emu", src))
+
+# what a node sends through- the address of a virtual datagram is ("emu", source port)
+class VirtualTransport():
+    def __init__(self, network, port):
+        self.network = network
+        self.port = port
+
+    def send(self, data, port):
+        self.network.send(self.port, port, data)
+
+    def reply(self, data, addr):
+        self.network.send(self.port, addr[1], data)
+
+# a ring, so the network is connected, plus random chords up to the average degree- [(a, b)] with a < b
+def make_topology(rng, n, degree):
+    edges = set()
+    for i in range(n):
+        if n > 1:
+            edges.add(tuple(sorted((i, (i + 1) % n))))
+    target = min(n * degree // 2, n * (n - 1) // 2)
+    while len(edges) < target:
+        a, b = rng.sample(range(n), 2)
+        edges.add((min(a, b), max(a, b)))
+    return sorted(edges)
+
+# "A-B@T" -> (T, A, B), with A and B node indexes
+def parse_link_event(text):
+    try:
+        link, at = text.split("@")
+        a, b = link.split("-")
+        return float(at), int(a), int(b)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected A-B@T, got {text!r}")
+
+# routes that disagree with the next hop's own table- none once the network has converged
+def inconsistent_routes(nodes):
+    bad = 0
+    for node in nodes.values():
+        for dest, (cost, hop) in node.routing_table.items():
+            if dest == node.my_port or cost >= INFINITY:
+                continue
+            via = 0.0 if hop == dest else nodes[hop].routing_table.get(dest, (INFINITY, None))[0]
+            if abs(node.link_cost[hop] + via - cost) > 0.011:
+                bad += 1
+    return bad
+
+# the last route change in the network since `since`- the network has converged once that is DV_QUIET old
+def last_change(nodes, since):
+    times = [node.last_change for node in nodes.values() if node.last_change is not None and node.last_change >= since]
+    return max(times) if times else None
+
+def main():
+    parser = argparse.ArgumentParser(description="Runs N nodes in one process over virtual links on a virtual clock")
+    parser.add_argument("--nodes", type=int, default=100)
+    parser.add_argument("--degree", type=int, default=4, help="average links per node (a ring plus random chords)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--mode", choices=("gbn", "sr"), default="gbn")
+    parser.add_argument("--drop", type=float, default=0.5, help="probe drop rates are drawn from 0..drop per link")
+    parser.add_argument("--loss", type=float, default=0.0, help="packet loss on every virtual link")
+    parser.add_argument("--delay", type=float, default=0.01, help="one-way delay of every link in seconds")
+    parser.add_argument("--bandwidth", type=float, default=None, help="bytes/s of every link (default unlimited)")
+    parser.add_argument("--queue", type=int, default=64, help="drop-tail queue of every link in full-size packets")
+    parser.add_argument("--stream", type=int, default=0, help="stream this many bytes over every link instead of the probe message")
+    parser.add_argument("--fail", type=parse_link_event, action="append", default=[], metavar="A-B@T",
+                        help="take the link between nodes A and B down at virtual time T (repeatable)")
+    parser.add_argument("--restore", type=parse_link_event, action="append", default=[], metavar="A-B@T",
+                        help="bring the link between nodes A and B back up at virtual time T (repeatable)")
+    parser.add_argument("--until", type=float, default=60.0, help="virtual seconds to run")
+    parser.add_argument("--verbose", action="store_true", help="keep every node's output")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    loop = VirtualLoop()
+    network = VirtualNetwork(loop, rng.random())
+    edges = make_topology(rng, args.nodes, args.degree)
+    links = set(edges)
+    for option, events in (("--fail", args.fail), ("--restore", args.restore)):
+        for at, a, b in events:
+            if (min(a, b), max(a, b)) not in links:
+                parser.error(f"{option} {a}-{b}@{at:g}: nodes {a} and {b} have no link in this topology")
+            if not START_AT < at < args.until:
+                parser.error(f"{option} {a}-{b}@{at:g}: the time has to be after START ({START_AT:g}s) and before --until")
+    for a, b in edges:
+        network.connect(BASE_PORT + a, BASE_PORT + b, args.loss, args.delay, args.bandwidth, args.queue)
+
+    # the lower port of every link sends probes (or its stream) over it, the higher one receives and drops them
+    send_ports = {i: [] for i in range(args.nodes)}
+    recv_ports = {i: [] for i in range(args.nodes)}
+    for a, b in edges:
+        send_ports[a].append(BASE_PORT + b)
+        recv_ports[b].append((BASE_PORT + a, round(rng.uniform(0, args.drop), 2)))
+    payload = rng.randbytes(args.stream) if args.stream else None
+
+    output = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(open(os.devnull, "w"))
+    nodes = {}
+    phases = [] # (what, when, end of the stretch, last route change in it)
+    wall = time.perf_counter()
+    with output:
+        for i in range(args.nodes):
+            port = BASE_PORT + i
+            node = Node(None, port, send_ports[i], recv_ports[i], mode=args.mode, loop=loop,
+                        transport=network.attach, rng=random.Random(rng.random()))
+            for dest in send_ports[i] if payload is not None else ():
+                node.send_stream(dest, payload)
+            node.launch(last=(i == args.nodes - 1))
+            nodes[port] = node
+
+        # run up to each link event, then past the last one- each stretch is timed from its own events, and events
+        # at the same time (e.g. every link of a node, to cut it off) are one stretch
+        events = {}
+        for up, changes in ((False, args.fail), (True, args.restore)):
+            for at, a, b in changes:
+                events.setdefault(at, []).append((up, a, b))
+        times = sorted(events)
+        stretches = [(START_AT, "START")] + [(at, ", ".join(f"link {a}-{b} {'up' if up else 'down'}" for up, a, b in events[at]))
+                                            for at in times]
+        for k, (at, what) in enumerate(stretches):
+            if k:
+                loop.run(until=at)
+                # the nodes at either end see the link change, everyone else hears it through DV
+                for up, a, b in events[at]:
+                    a, b = BASE_PORT + a, BASE_PORT + b
+                    network.set_up(a, b, up)
+                    cost = 0.0 if up else INFINITY
+                    nodes[a].set_link_cost(b, cost)
+                    nodes[b].set_link_cost(a, cost)
+            end = stretches[k + 1][0] if k + 1 < len(stretches) else args.until
+            loop.run(until=end)
+            phases.append((what, at, end, last_change(nodes, at)))
+    wall = time.perf_counter() - wall
+
+    print(f"{args.nodes} nodes, {len(edges)} links, mode={args.mode}, seed={args.seed}")
+    print(f"virtual {loop.time():.1f}s in {wall:.2f}s wall ({loop.time() / wall:.1f}x real time, {loop.events} events)")
+    for what, at, end, changed in phases:
+        if changed is None:
+            print(f"{what} at {at:.1f}s: no route changes")
+        elif end - changed < DV_QUIET:
+            print(f"{what} at {at:.1f}s: still changing at {end:.1f}s")
+        else:
+            print(f"{what} at {at:.1f}s: converged in {changed - at:.3f}s")
+
+    routes = sum(1 for node in nodes.values() for dest, (cost, _) in node.routing_table.items()
+                 if dest != node.my_port and cost < INFINITY)
+    print(f"routes: {routes} of {args.nodes * (args.nodes - 1)} pairs reachable, {inconsistent_routes(nodes)} inconsistent")
+    dv = {kind: sum(node.dv_bytes[kind] for node in nodes.values()) for kind in ("full", "delta", "ack", "received")}
+    print(f"DV control bytes: full={dv['full']} delta={dv['delta']} ack={dv['ack']} received={dv['received']}")
+
+    stats = [s for node in nodes.values() for s in node.transfer_stats.values()]
+    if stats:
+        nbytes = sum(s[3] for s in stats)
+        resent = sum(s[2] for s in stats)
+        goodput = sum(s[3] / s[4] for s in stats if s[4] > 0) / len(stats)
+        print(f"transfers: {len(stats)} of {len(edges)} done, {nbytes} bytes, {resent} retransmissions, "
+              f"mean goodput {goodput:.1f} B/s")
+    streams = [s for node in nodes.values() for s in node.stream_stats.values()]
+    if streams:
+        throughput = sum(s[0] / s[2] for s in streams if s[2] > 0) / len(streams)
+        print(f"streams: {len(streams)} received, {sum(s[0] for s in streams)} bytes, mean throughput {throughput:.1f} B/s")
+    links = network.links.values()
+    print(f"links: {sum(l.packets for l in links)} packets, {sum(l.lost for l in links)} lost, "
+          f"{sum(l.overflow for l in links)} queue drops")
+
+if __name__ == "__main__":
+    main()
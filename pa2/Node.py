@@ -1,286 +1,521 @@
-from socket import *
-import time
 import random
-import threading
-import struct
-
-from Packet import Packet
 
+from Packet import DV_PER_FRAGMENT, MTU, Packet
+from Routing import INFINITY, NeighborMatrix
+from Runtime import EventLoop, UdpTransport
+from Transport import RECV_WINDOW, CountingSink, GbnSender, PeerReceiver, SrSender
+
+MODES = ("gbn", "sr") # go-back-N or selective repeat, picked per node for its senders
+SENDERS = {"gbn": GbnSender, "sr": SrSender}
+DV_TICK = 0.5       # how often link costs are re-measured
+DV_MIN_INTERVAL = 1.0 # a change triggers an update right away, but never sooner than this after the last one
+DV_QUIET = 3.0      # a table unchanged this long after a change counts as converged
+DV_FULL_INTERVAL = 30 # every neighbor gets the whole table this often, whatever it has ACK'd
+DV_PARTIAL = 4      # versions per neighbor being reassembled at once- older ones are given up on
+MIN_LINK_COST = 0.01 # a lossless link still costs this much- free links let two nodes route through each other
+DV_HOLD_DOWN = 10.0 # a route lost through its next hop stays unreachable this long before another neighbor's offer is taken
+
+MESSAGE = ['h', 'e', 'l', 'l', 'o', ' ', 't', 'h', 'e', 'r', 'e']
+
+# A node runs entirely on one event loop: its transport hands it every datagram, each one goes to the state
+# machine of the peer it came from (keyed by the packet's source port, which is always the peer's listening
+# port), and retransmission and DV timers are loop timers. Nothing blocks and nothing needs a lock, and several
+# nodes can share a loop by passing the same one in. By default that is a real EventLoop and a UDP socket; a
+# factory transport(loop, port, on_datagram) plugs in something else (Emulator.py runs nodes on a virtual network
+# that way), and rng is the random source for probe drops, so a seeded one makes a run repeatable
 class Node():
-    def __init__(self, ip, my_port, send_ports, recv_ports, window_size=5):
+    def __init__(self, ip, my_port, send_ports, recv_ports, window_size=RECV_WINDOW, mode="gbn", loop=None, sink=None,
+                 transport=None, rng=None):
+        if mode not in MODES:
+            raise ValueError(f"unknown transport mode: {mode}")
+        self.mode = mode
         self.my_port = int(my_port)
         self.send_ports = send_ports
         self.recv_ports = recv_ports
-        
+        self.loop = loop if loop is not None else EventLoop()
+
         self.ip = (ip if ip is not None else "localhost")
-        self.window_size = int(window_size)
-
-        # create and bind one UDP socket for node
-        self.recv_socket = socket(AF_INET, SOCK_DGRAM)
-        self.recv_socket.bind(('0.0.0.0', self.my_port))
-
-        self.send_socket = socket(AF_INET, SOCK_DGRAM)
-        self.send_socket.bind(('0.0.0.0', 0))
-        
-        self.send_port = int(self.send_socket.getsockname()[1])
-        self.send_socket.settimeout(0.5) # timeout at 5s so doesn't globble chat
-        
+        self.window_size = min(int(window_size), RECV_WINDOW) # cap on the congestion window
+
+        self.rng = rng if rng is not None else random.Random()
+
+        # one transport for the node- probes, ACKs, START and DV all go through it (a UDP socket unless told otherwise)
+        if transport is None:
+            self.transport = UdpTransport(self.loop, self.ip, self.my_port, self._on_datagram)
+        else:
+            self.transport = transport(self.loop, self.my_port, self._on_datagram)
+
         # broadcasting to fire other senders
         self.peers = set(self.send_ports) | { port for (port,_) in self.recv_ports }
-        self.start_event = threading.Event()
-        
-        #DV 
+        self.started = False
+
+        # per-peer state machines- a sender per send port, a receiver per peer that sends us probes
+        self.drop_p = dict(self.recv_ports)
+        self.senders = {}
+        self.receivers = {}
+        self.when_done = None
+        # byte streams queued by send_stream, sent in place of the probe message
+        self.streams = {}
+        # sink(src_port) gives the writable object a received stream goes to- by default it is only counted
+        self.sink = sink if sink is not None else (lambda src_port: CountingSink())
+
+        #DV
         self.round2        = lambda x: round(x, 2)
         # dest = (cost, nextHop)
-        self.dv_seq = 0
-        self.last_seen_seq = {} 
         self.routing_table = {self.my_port: (0.0, self.my_port)}
         for p in self.send_ports:
-            self.routing_table[p] = (0.0, p)
+            self.routing_table[p] = (MIN_LINK_COST, p)
         for p, _ in self.recv_ports:
-            self.routing_table.setdefault(p, (0.0, p))
+            self.routing_table.setdefault(p, (MIN_LINK_COST, p))
+        # measured cost of each direct link, and the latest vector each neighbor advertised in an array-backed
+        # matrix- every route is recomputed from them in one pass whenever something changes
+        self.link_cost = {p: MIN_LINK_COST for p in self.peers}
+        self.matrix = NeighborMatrix(self.my_port)
+        for p in sorted(self.peers):
+            self.matrix.add_neighbor(p, MIN_LINK_COST)
+        self.matrix.recompute()
+
+        # versioned updates: each neighbor ACKs the versions it gets and is then only sent the entries that
+        # changed since the last version it ACK'd, or the whole table when it has ACK'd none
+        self.dv_version = 1
+        self.entry_version = {d: 1 for d in self.routing_table} # dest -> version its cost last changed in
+        self.changed = set()                                   # dests changed since the last update went out
+        self.acked_version = {p: 0 for p in self.peers}        # neighbor -> newest of our versions it ACK'd
+        self.nbr_version = {}                                  # neighbor -> newest of its versions applied here
+        self.dv_partial = {}                                   # neighbor -> {version: [base, frags, {index: entries}]}
+        self.last_full = 0
+        # control-plane bytes: DV tables sent whole or as deltas, DV ACKs/requests, and everything DV received
+        self.dv_bytes = {"full": 0, "delta": 0, "ack": 0, "received": 0}
+        # one datagram-sized send buffer every DV fragment is packed into
+        self.dv_buffer = bytearray(MTU)
+        self.dv_view = memoryview(self.dv_buffer)
 
-        self.dv_lock = threading.Lock()
-        self.table_dirty = True #check if table good or not
         self.last_broadcast = 0
-        
+        self.update_timer = None # pending triggered update
+        # convergence: an episode starts with the first route change after a quiet spell and ends DV_QUIET after
+        # the last one- (start, last change, route changes) per episode
+        self.episode = None
+        self.convergence = []
+        self.last_change = None # time of the most recent route change
+        # route poisoning with hold-down: dest -> time until which its poisoned route ignores other neighbors' offers
+        self.hold_down = {}
+
+        # probes sent to each neighbor and how many of them had to be resent- the ratio is the link cost
         self.sent_cnt = {p: 0 for p in self.send_ports}
         self.lost_cnt = {p: 0 for p in self.send_ports}
 
-        # start DV timer thread
-        #threading.Thread(target=self.dv_timer_thread, daemon=True, name=f"dv-{self.my_port}").start()
-
-        threading.Thread(target=self.dv_timer_thread, daemon=False, name=f"dv-{self.my_port}").start()
+        # per-destination transfer results (mode, packets, retransmissions, bytes, seconds) for comparing modes
+        self.transfer_stats = {}
+        # per-source received stream results (bytes, packets, seconds)
+        self.stream_stats = {}
+        # per-destination congestion control trace: [(time, event, cwnd, ssthresh, srtt, rto)]
+        self.cc_trace = {}
 
         # print the very first table
         self._print_table()
-  
+
+    # run the node until ctrl+C- the last node kicks off the network after giving the others a second to come up.
+    # when_done is called once every sender has finished its transfer
+    def run(self, last=False, when_done=None):
+        self.launch(last, when_done)
+        try:
+            self.loop.run_forever()
+        except KeyboardInterrupt:
+            print(f"[{self.my_port}] stopping")
+
+    # arm the node without running its loop, for callers that run a loop shared by many nodes
+    def launch(self, last=False, when_done=None):
+        self.when_done = when_done
+        if last:
+            self.loop.call_later(1.0, self._start)
+
+    def send_to(self, data, port):
+        self.transport.send(data, port)
+
+    def reply(self, data, addr):
+        self.transport.reply(data, addr)
+
     def broadcast_start(self):
         print(f"[{self.my_port}] broadcasting START to {sorted(self.peers)}")
         for peer in self.peers:
-            #packet = Packet(self.send_port, peer, 0, 2) # send start packet
             packet = Packet(self.my_port, peer, 0, Packet.START)  # send start packet from logical source
-            self.send_socket.sendto(packet.packet_to_bytes(), (self.ip, peer))
-
-
-    def run_receiver(self, port, p = 0.25):
-        recv_socket = self.recv_socket
-        expected_seq_num = 0
-
-        # print(f"receiver on port {self.my_port} is set up!")
-        # accept a connection
-        print(f"[recv on {self.my_port}] starting, drop_p={p}")
-       
-        while True:
-            data, client_address = recv_socket.recvfrom(1024)
-            try:
-                packet = Packet.bytes_to_packet(data)
-                # intentionally drop every 4th packet
-
-                # if broadcast packet comes in and no thread running
-                if packet.packet_type == Packet.START and not self.start_event.is_set():
-                    print(f"[{self.my_port}] got GLOBAL START from {client_address[1]}")
-
-                    # immediately re-broadcast to all neighbors
-                    self.broadcast_start()
-                    self._send_dv_update()
-                    # wake up the main thread
-                    self.start_event.set()
-                    continue
+            self.send_to(packet.packet_to_bytes(), peer)
 
-                if packet.packet_type == Packet.DV:
-                    self._handle_dv_packet(packet, client_address)
-                    continue
-                
-                if packet.packet_type == Packet.ACK:
-                    continue
-                    
-                if packet.packet_type == Packet.PROBE:
-                    if random.random() < p:
-                    #if packet.seq_num % 4 == 0:
-                        # print(f"Dropped packet {packet.seq_num}")
-                        if port in self.lost_cnt:
-                            self.lost_cnt[port] += 1
-                        print(f"[recv:{port}] dropped seq={packet.seq_num}")
-                        continue
-
-                    # if we get the correct seq num, make new packet and send it to client socket
-                    if packet.seq_num == expected_seq_num:
-                        print(f"[recv:{port}] {packet.data.decode()} (seq num: {packet.seq_num})")
-                        ack_packet = Packet(self.my_port, packet.source_port, packet.seq_num, 1)
-                        recv_socket.sendto(ack_packet.packet_to_bytes(), client_address)
-                        expected_seq_num = expected_seq_num + 1
-
-                    # otherwise we got a packet out of order so resend ACK of last ACK'd packet
-                    else: 
-                        if expected_seq_num > 0:
-                            ack_packet = Packet(self.my_port, packet.source_port, expected_seq_num - 1, 1)
-                            recv_socket.sendto(ack_packet.packet_to_bytes(), client_address)
-                            print(f"[recv:{port}] Out of order packet {packet.seq_num} sent re-ACK for {expected_seq_num - 1}")
-                    continue
+    # START seen (or we are the last node)- flood it on, then start the DV timer and a sender per neighbor
+    def _start(self):
+        if self.started:
+            return
+        self.started = True
+        self.broadcast_start()
+        self.loop.call_later(DV_TICK, self._dv_tick)
+        self._trigger_update()
+        for port in self.send_ports:
+            self._open_sender(port)
+        for port in self.streams:
+            if port not in self.senders:
+                self._open_sender(port)
+        if not self.senders:
+            self._all_done()
+
+    # stream a byte source (bytes, a binary file or an iterable of byte strings) reliably to dest_port in
+    # MTU-sized DATA packets, in place of the probe message- starts with the other senders once START is seen
+    def send_stream(self, dest_port, source):
+        if dest_port in self.senders or dest_port in self.streams:
+            raise ValueError(f"already sending to port {dest_port}")
+        self.streams[dest_port] = source
+        if self.started:
+            self._open_sender(dest_port)
+
+    def _open_sender(self, port):
+        self.sent_cnt.setdefault(port, 0)
+        self.lost_cnt.setdefault(port, 0)
+        if port in self.streams:
+            sender = SENDERS[self.mode](self, port, self.streams[port], stream=True)
+        else:
+            sender = SENDERS[self.mode](self, port, MESSAGE)
+        self.senders[port] = sender
+        sender.start()
+
+    # the transport got a datagram- hand it to its peer's state machine
+    def _on_datagram(self, data, client_address):
+        try:
+            self._dispatch(Packet.bytes_to_packet(data), client_address)
+        except Exception as e:
+            print(f"Exception occured: {e}")
+
+    def _dispatch(self, packet, client_address):
+        kind = packet.packet_type
+        src = packet.source_port
+
+        if kind == Packet.ACK:
+            sender = self.senders.get(src)
+            if sender is not None:
+                sender.on_ack(packet)
+            return
 
-                # print(f"recieved from client: {sentence.decode()}")
-                # capital_sentence = sentence.decode().upper()
+        if kind == Packet.PROBE or kind == Packet.SR_PROBE or kind == Packet.DATA or kind == Packet.SR_DATA:
+            receiver = self.receivers.get(src)
+            if receiver is None:
+                receiver = self.receivers[src] = PeerReceiver(self, src, self.drop_p.get(src, 0))
+                print(f"[{self.my_port}] receiving from {src} (p={receiver.p})")
+            if kind == Packet.PROBE or kind == Packet.DATA:
+                receiver.on_gbn(packet, client_address)
+            else:
+                receiver.on_sr(packet, client_address)
+            return
 
-                # recv_socket.sendto(capital_sentence.encode(), client_address)
-            except TimeoutError as e:
-                print(f"Reciever timed out, trying again")
-            except Exception as e:
-                print(f"Exception occured: {e}")
+        if kind == Packet.DV:
+            self._handle_dv_packet(packet, client_address)
+            return
 
+        if kind == Packet.DV_ACK:
+            self._handle_dv_ack(packet)
+            return
 
-    def run_sender(self, dest_port):
-        try:
-            send_socket = self.send_socket
-            send_port = self.send_port
-            message = ['h', 'e', 'l', 'l', 'o', ' ', 't', 'h', 'e', 'r', 'e']
-
-            next_seq_num = 0
-            window_idx = 0
-
-            print(f"Trying to connect to port {dest_port}")
-
-            timer = False
-            timer_start_time = 0
-            
-            while window_idx < len(message):
-
-                # send packets within window
-                while next_seq_num < window_idx + self.window_size and next_seq_num < len(message):
-                    print(f"sending packet {next_seq_num}, data={message[next_seq_num]}")
-                    packet = Packet(self.send_port, dest_port, next_seq_num, 0, message[next_seq_num])
-                    send_socket.sendto(packet.packet_to_bytes(), (self.ip, dest_port))
-                    self.sent_cnt[dest_port] += 1
-                    print(f"sending packet {next_seq_num}, data={message[next_seq_num]}") #DEBUG
-                    next_seq_num = next_seq_num + 1
-                
-                # start timer if not active and if there are unACK'd packets
-                if not timer and window_idx < next_seq_num:
-                    timer_start_time = time.time()
-                    timer = True
-                
-                try:
-                    data, server_address = send_socket.recvfrom(1024)
-                    packet = Packet.bytes_to_packet(data)
-
-                    if packet.packet_type == 1 and server_address[1] == dest_port and packet.seq_num >= window_idx:
-                        window_idx = packet.seq_num + 1
-                        print(f"received ACK {packet.seq_num}, window idx now {window_idx}")
-
-                        # all sent packets are ACK'd
-                        if window_idx == next_seq_num:
-                            timer = False
-                        else:
-                            timer_start_time = time.time() # restart timer
-
-                except timeout:
-                    if timer and time.time() - timer_start_time >= 0.5:
-                        print(f"timeout at window idx: {window_idx}, resending window")
-
-                        for seq in range(window_idx, next_seq_num):
-                            packet = Packet(send_port, dest_port, seq, 0, message[seq])
-                            send_socket.sendto(packet.packet_to_bytes(), (self.ip, dest_port))
-                            self.sent_cnt[dest_port] += 1
-                            print(f"resent packet {seq}")
-
-                        timer_start_time = time.time()
-
-
-            # send_socket.sendto(sentence.encode(), (self.ip, dest_port))
-
-            # modified_sentence, server_address = client_socket.recvfrom(1024)
-            # print(f"from server: ", modified_sentence.decode())
-    
-
-            # don't close socket or else it'll close socket if multiple ports are specified
-            # send_socket.close()
+        if kind == Packet.DV_REQUEST:
+            self._handle_dv_request(packet)
+            return
+
+        # if broadcast packet comes in and we have not started yet
+        if kind == Packet.START and not self.started:
+            print(f"[{self.my_port}] got GLOBAL START from {src}")
+            self._start()
+
+    # record and print how a transfer went so go-back-N and selective repeat can be compared on the same links
+    def _sender_done(self, dest_port, packets, retransmissions, nbytes, elapsed):
+        goodput = nbytes / elapsed if elapsed > 0 else 0.0
+        self.transfer_stats[dest_port] = (self.mode, packets, retransmissions, nbytes, elapsed)
+        print(f"[stats {self.my_port}->{dest_port}] mode={self.mode} packets={packets} retransmissions={retransmissions} "
+              f"bytes={nbytes} time={elapsed:.2f}s goodput={goodput:.1f} B/s")
+        if all(sender.done for sender in self.senders.values()):
+            self._all_done()
+
+    def open_sink(self, src_port):
+        return self.sink(src_port)
+
+    # a received stream is complete- print its end-to-end throughput (first data packet in to last one delivered)
+    def _stream_done(self, src_port, nbytes, packets, elapsed):
+        throughput = nbytes / elapsed if elapsed > 0 else 0.0
+        self.stream_stats[src_port] = (nbytes, packets, elapsed)
+        print(f"[stream {src_port}->{self.my_port}] bytes={nbytes} packets={packets} time={elapsed:.2f}s "
+              f"throughput={throughput:.1f} B/s")
+
+    def _all_done(self):
+        if self.when_done is not None:
+            self.when_done(self)
 
-        except KeyboardInterrupt:
-            print(f"Forced stopping sending to port {dest_port}")
-            exit()
-        # except socket.error:
-            # print(f"{self.ip} not responding on port {self.their_port}")
-            # exit()
-    
     def _print_table(self):
-        print(f"[DV][{time.time():.3f}] Node {self.my_port} Routing Table")
+        print(f"[DV][{self.loop.wall():.3f}] Node {self.my_port} Routing Table")
         for dst, (cost, hop) in sorted(self.routing_table.items()):
             if dst == self.my_port:
                 print(f" - ({cost:.2f}) -> Node {dst}")
+            elif cost >= INFINITY:
+                print(f" - (inf) -> Node {dst} ; unreachable")
             else:
                 print(f" - ({cost:.2f}) -> Node {dst} ; Next hop -> Node {hop}")
 
-    def _send_dv_update(self):
-        with self.dv_lock:
-            self.dv_seq += 1
-            entries = {d: c for d, (c, _) in self.routing_table.items()}
-        #for nbr in self.peers:
-           # pkt = Packet(self.send_port, nbr, 0, Packet.DV, entries)
+    # record a route, noting the destination for the next update if it moved- a new next hop changes what is
+    # advertised too, since the route is poisoned towards its next hop
+    def _set_route(self, dest, cost, hop):
+        old = self.routing_table.get(dest)
+        if old == (cost, hop):
+            return False
+        self.routing_table[dest] = (cost, hop)
+        self.changed.add(dest)
+        now = self.loop.time()
+        if self.episode is None:
+            self.episode = [now, now, 0]
+        self.episode[1] = now
+        self.episode[2] += 1
+        self.last_change = now
+        return True
+
+    # send an update for the changes so far as soon as the rate limit allows
+    def _trigger_update(self):
+        if self.update_timer is not None:
+            return
+        delay = max(0.0, self.last_broadcast + DV_MIN_INTERVAL - self.loop.time())
+        self.update_timer = self.loop.call_later(delay, self._triggered_update)
+
+    def _triggered_update(self):
+        self.update_timer = None
+        print(f"[DV][{self.loop.wall():.3f}] Node {self.my_port}: broadcasting DV update…")
+        self._send_dv_update()
+        self.last_broadcast = self.loop.time()
+        b = self.dv_bytes
+        print(f"[DV][{self.loop.wall():.3f}] Node {self.my_port}: control bytes sent full={b['full']} delta={b['delta']} "
+              f"ack={b['ack']} received={b['received']}")
+
+    # fold the changes made since the last update into a new table version
+    def _bump_version(self):
+        if self.changed:
+            self.dv_version += 1
+            for dest in self.changed:
+                self.entry_version[dest] = self.dv_version
+            self.changed.clear()
+
+    # send every neighbor what it is missing- a delta against the version it last ACK'd, the whole table if it
+    # has ACK'd nothing (or full is set, or DV_FULL_INTERVAL has passed since the last full round)
+    def _send_dv_update(self, full=False):
+        self._bump_version()
+        now = self.loop.time()
+        if full or now - self.last_full >= DV_FULL_INTERVAL:
+            full = True
+            self.last_full = now
+        # neighbors that ACK'd the same version get the same delta, so each one is encoded only once
+        by_base = {}
         for nbr in self.peers:
-            pkt = Packet(self.my_port, nbr, 0, Packet.DV, entries)
-            self.send_socket.sendto(pkt.packet_to_bytes(), (self.ip, nbr))
-            print(f"[DV][{time.time():.3f}] Node {self.my_port}: Table sent to Node {nbr}")
+            base = 0 if full else self.acked_version.get(nbr, 0)
+            if base < self.dv_version:
+                by_base.setdefault(base, []).append(nbr)
+        for base, nbrs in by_base.items():
+            self._send_dv(base, nbrs)
+
+    # split horizon with poison reverse: a route is advertised as unreachable to the neighbor it goes through,
+    # so the two cannot bounce a dead destination between them. Neighbors with nothing to poison share one encoding
+    def _send_dv(self, base, nbrs):
+        table = self.routing_table
+        if base:
+            entries = {d: table[d][0] for d, v in self.entry_version.items() if v > base}
+        else:
+            entries = {d: c for d, (c, _) in table.items()}
+        shared = []
+        for nbr in nbrs:
+            poisoned = {d: INFINITY for d in entries if table[d][1] == nbr and d != nbr}
+            if poisoned:
+                self._send_entries({**entries, **poisoned}, base, [nbr])
+            else:
+                shared.append(nbr)
+        if shared:
+            self._send_entries(entries, base, shared)
+
+    def _send_entries(self, entries, base, nbrs):
+        kind = "delta" if base else "full"
+        # split the table into fragments that each fit one datagram, encode each fragment once, then only
+        # rewrite the dest port for each neighbor
+        items = list(entries.items())
+        frags = max(1, -(-len(items) // DV_PER_FRAGMENT))
+        nbytes = 0
+        for frag in range(frags):
+            chunk = dict(items[frag * DV_PER_FRAGMENT:(frag + 1) * DV_PER_FRAGMENT])
+            pkt = Packet(self.my_port, 0, self.dv_version, Packet.DV, chunk, base, frag, frags)
+            size = pkt.pack_into(self.dv_buffer)
+            nbytes += size
+            for nbr in nbrs:
+                Packet.readdress(self.dv_buffer, nbr)
+                self.send_to(self.dv_view[:size], nbr)
+        for nbr in nbrs:
+            self.dv_bytes[kind] += nbytes
+            print(f"[DV][{self.loop.wall():.3f}] Node {self.my_port}: Table sent to Node {nbr} "
+                  f"(v{self.dv_version} {kind}, {len(entries)} entries in {frags} fragments, {nbytes} bytes)")
+
+    def _send_dv_control(self, nbr, kind, version=0):
+        data = Packet(self.my_port, nbr, version, kind).packet_to_bytes()
+        self.send_to(data, nbr)
+        self.dv_bytes["ack"] += len(data)
 
     def _handle_dv_packet(self, pkt, addr):
         sender = pkt.source_port
-        if pkt.seq_num <= self.last_seen_seq.get(sender, 0):
+        self.dv_bytes["received"] += pkt.size()
+        have = self.nbr_version.get(sender, 0)
+        # stale- this version or a newer one was applied already (a resend, or our ACK got lost), just ACK again
+        if pkt.seq_num <= have:
+            self._send_dv_control(sender, Packet.DV_ACK, have)
             return
-        self.last_seen_seq[sender] = pkt.seq_num
-        
-        print(f"[{time.time():.3f}] Node {self.my_port}: Table received from Node {sender}")
-        with self.dv_lock:
-            if self._bellman_ford_update(sender, pkt.dv_entries):
-                self.table_dirty = True
-                print(f"[DV][{time.time():.3f}] Node {self.my_port}: table marked dirty")
-                self._print_table()
-
-    def dv_timer_thread(self):
-        print(f"[DV-timer {self.my_port}] thread started, waiting for START")
-        # wait until START has happened
-        self.start_event.wait()
-        print(f"[DV-timer {self.my_port}] START seen, entering loop")
-        self.last_broadcast = time.time()
-        while True:
-            time.sleep(0.5)
-            with self.dv_lock:
-                dirty_local = False
-                # update link costs
-                for nbr in self.send_ports:
-                    sent = getattr(self, 'sent_cnt', {}).get(nbr, 0)
-                    lost = getattr(self, 'lost_cnt', {}).get(nbr, 0)
-                    if sent == 0:
-                        continue
-                    ratio = self.round2(lost / sent)
-                    print(f"[DV-timer {self.my_port}] nbr={nbr} sent={sent} lost={lost} ratio={ratio} old={self.routing_table[nbr][0]}")
-
-                    # reset counters
-                    self.sent_cnt[nbr] = self.lost_cnt[nbr] = 0
-                    old = self.routing_table[nbr][0]
-                    if abs(ratio - old) >= 0.01:
-                        self.routing_table[nbr] = (ratio, nbr)
-                        dirty_local = True
-                        print(f"[DV][{time.time():.3f}] Node {self.my_port}: Updated cost to {nbr} → {ratio:.2f}")
-                        self._print_table()
-
-                if dirty_local:
-                    self.table_dirty = True
-
-                if self.table_dirty and time.time() - self.last_broadcast >= 5:
-                    print(f"[DV][{time.time():.3f}] Node {self.my_port}: broadcasting DV update…")
-                    print(f"[DV-timer {self.my_port}] about to broadcast table to {self.peers}")
-                    self._send_dv_update()
-                    self.table_dirty = False
-                    self.last_broadcast = time.time()
-
-    def _bellman_ford_update(self, nbr, nbr_tbl):
+        if pkt.frags > 1:
+            pkt = self._reassemble(pkt)
+            if pkt is None:
+                return
+        # a delta against a version we never got would leave entries out- ask for the whole table. Its costs
+        # are still real costs, so they are applied anyway
+        if pkt.base > have:
+            print(f"[DV][{self.loop.wall():.3f}] Node {self.my_port}: missed versions {have + 1}..{pkt.base} of Node {sender}, requesting full table")
+            self._send_dv_control(sender, Packet.DV_REQUEST)
+        else:
+            self.nbr_version[sender] = pkt.seq_num
+            self._send_dv_control(sender, Packet.DV_ACK, pkt.seq_num)
+            # fragments of older versions still being reassembled are stale now
+            partial = self.dv_partial.get(sender)
+            for version in [v for v in partial or () if v < pkt.seq_num]:
+                del partial[version]
+
+        print(f"[{self.loop.wall():.3f}] Node {self.my_port}: Table received from Node {sender} "
+              f"(v{pkt.seq_num} {'delta' if pkt.base else 'full'}, {len(pkt.dv_entries)} entries)")
+        # a whole table replaces what we had from this neighbor, a delta is merged into it
+        self.matrix.update(sender, pkt.dv_entries, not pkt.base)
+        if self._recompute():
+            print(f"[DV][{self.loop.wall():.3f}] Node {self.my_port}: table changed")
+            self._print_table()
+            self._trigger_update()
+
+    # hold the fragments of a version until all of them are in- a duplicate fragment is dropped, and once a
+    # version is whole it comes back as one packet carrying every entry
+    def _reassemble(self, pkt):
+        partial = self.dv_partial.setdefault(pkt.source_port, {})
+        state = partial.get(pkt.seq_num)
+        if state is None:
+            if len(partial) >= DV_PARTIAL:
+                del partial[min(partial)] # give up on the oldest- later deltas or a full resync cover it
+            state = partial[pkt.seq_num] = [pkt.base, pkt.frags, {}]
+        if pkt.frag in state[2] or pkt.frag >= state[1]:
+            return None
+        state[2][pkt.frag] = pkt.dv_entries
+        if len(state[2]) < state[1]:
+            return None
+        del partial[pkt.seq_num]
+        entries = {}
+        for frag in range(state[1]):
+            entries.update(state[2][frag])
+        return Packet._make(Packet.DV, pkt.source_port, pkt.dest_port, pkt.seq_num, None, entries, state[0], 0, 1)
+
+    def _handle_dv_ack(self, pkt):
+        if pkt.seq_num > self.acked_version.get(pkt.source_port, 0):
+            self.acked_version[pkt.source_port] = pkt.seq_num
+
+    # a neighbor lost track of our versions- send it the whole table now
+    def _handle_dv_request(self, pkt):
+        self._bump_version()
+        self._send_dv(0, [pkt.source_port])
+
+    # runs every DV_TICK once START has happened
+    def _dv_tick(self):
+        self.loop.call_later(DV_TICK, self._dv_tick)
+        dirty_local = False
+        # update link costs
+        for nbr in self.send_ports:
+            sent = self.sent_cnt[nbr]
+            lost = self.lost_cnt[nbr]
+            if sent == 0:
+                continue
+            ratio = max(self.round2(lost / sent), MIN_LINK_COST)
+            print(f"[DV-timer {self.my_port}] nbr={nbr} sent={sent} lost={lost} ratio={ratio} old={self.link_cost[nbr]}")
+
+            # reset counters
+            self.sent_cnt[nbr] = self.lost_cnt[nbr] = 0
+            # a link set down by set_link_cost stays down until set_link_cost brings it back
+            if self.link_cost[nbr] >= INFINITY:
+                continue
+            if abs(ratio - self.link_cost[nbr]) >= 0.01:
+                self._set_link(nbr, ratio)
+                dirty_local = True
+
+        # a link cost moved either way- routes through that link may now be worse, so recompute them all
+        if dirty_local:
+            self._link_changed()
+
+        now = self.loop.time()
+        if self.episode is not None and now - self.episode[1] >= DV_QUIET:
+            start, end, changes = self.episode
+            self.episode = None
+            self.convergence.append((start, end, changes))
+            print(f"[DV][{self.loop.wall():.3f}] Node {self.my_port}: converged in {end - start:.3f}s ({changes} route changes)")
+
+        if now - self.last_full >= DV_FULL_INTERVAL and self.update_timer is None:
+            self._send_dv_update(full=True)
+
+    # set the cost of the direct link to a neighbor from outside the probe measurements- e.g. INFINITY when the
+    # link has gone down, so everything routed over it moves elsewhere or becomes unreachable
+    def set_link_cost(self, nbr, cost):
+        if nbr not in self.link_cost:
+            raise ValueError(f"{nbr} is not a neighbor of {self.my_port}")
+        self._set_link(nbr, max(cost, MIN_LINK_COST))
+        self._link_changed()
+
+    def _set_link(self, nbr, cost):
+        self.link_cost[nbr] = cost
+        self.matrix.set_link(nbr, cost)
+        print(f"[DV][{self.loop.wall():.3f}] Node {self.my_port}: Updated cost to {nbr} → {cost:.2f}")
+
+    def _link_changed(self):
+        if self._recompute():
+            self._print_table()
+            self._trigger_update()
+
+    # recompute every route from the link costs and the neighbor vectors and apply the ones that moved- a
+    # destination nobody can reach any more stays in the table as unreachable so the news spreads.
+    # When the next hop of a route stops offering it (its link went down or it advertised the destination as
+    # unreachable), the route is poisoned right away and held down for DV_HOLD_DOWN: what the other neighbors
+    # offer for it meanwhile may be their stale routes through this very node, and taking one would count to
+    # infinity. By the time the hold-down is over the poison has reached everyone whose route went the same way
+    def _recompute(self):
         changed = False
-        cost_to_nbr = self.routing_table[nbr][0]
-        for dest, nbr_cost in nbr_tbl.items():
-            if dest == self.my_port:
+        for dest, cost, hop in self.matrix.recompute():
+            if dest in self.hold_down:
                 continue
-            new = self.round2(cost_to_nbr + nbr_cost)
-            old = self.routing_table.get(dest, (float('inf'), None))[0]
-            if new + 1e-9 < old:
-                self.routing_table[dest] = (new, nbr)
+            old = self.routing_table.get(dest)
+            if old is not None and old[0] < INFINITY and self.matrix.cost_via(old[1], dest) >= INFINITY:
+                self._poison(dest, old[1])
                 changed = True
+                continue
+            if hop is None:
+                if old is None:
+                    continue
+                hop = old[1]
+            changed = self._set_route(dest, cost, hop) or changed
         return changed
+
+    def _poison(self, dest, hop):
+        print(f"[DV][{self.loop.wall():.3f}] Node {self.my_port}: lost route to {dest} via {hop}, holding it down")
+        self._set_route(dest, INFINITY, hop)
+        self.hold_down[dest] = self.loop.call_later(DV_HOLD_DOWN, self._hold_down_over, dest)
+
+    # the hold-down is over- take the best route the neighbors offer now, if there is one
+    def _hold_down_over(self, dest):
+        del self.hold_down[dest]
+        cost, hop = self.matrix.route(dest)
+        if hop is not None and self._set_route(dest, cost, hop):
+            self._print_table()
+            self._trigger_update()
+
+    # keep one (time, event, cwnd, ssthresh, srtt, rto) row per sender event for later analysis
+    def _trace(self, dest_port, event, cc, rtt):
+        self.cc_trace.setdefault(dest_port, []).append((self.loop.time(), event, cc.cwnd, cc.ssthresh, rtt.srtt, rtt.timeout()))
+
+    # write every sender's cwnd/RTO trace as CSV
+    def write_trace(self, path):
+        with open(path, "w") as file:
+            file.write("dest,time,event,cwnd,ssthresh,srtt,rto\n")
+            for dest, rows in sorted(self.cc_trace.items()):
+                for t, event, cwnd, ssthresh, srtt, rto in rows:
+                    srtt = "" if srtt is None else f"{srtt:.6f}"
+                    file.write(f"{dest},{t:.6f},{event},{cwnd:.3f},{ssthresh:.3f},{srtt},{rto:.6f}\n")
@@ -1,103 +1,177 @@
 import struct
-import time
+from itertools import chain
+
+# precompiled wire formats so nothing re-parses a format string per packet
+# >: big endian
+# B: unsigned char = 8 bits ==> 1 byte
+# H: unsigned short = 16 bits ==> 2 bytes
+# I: unsigned int = 32 bits ==> 4 bytes
+# f: float = 32 bits ==> 4 bytes
+HEADER = struct.Struct(">BHHIB")    # type, source port, dest port, seq num, data byte
+DV_HEADER = struct.Struct(">BHHIIHHH") # type, source port, dest port, version, base version, fragment index, fragment count, number of entries
+DV_ENTRY = struct.Struct(">Hf")     # dest port, cost
+DATA_HEADER = struct.Struct(">BHHIH") # type, source port, dest port, seq num, payload length- payload follows
+DEST_PORT = struct.Struct(">H")     # dest port field alone, sits at byte 3 of every packet
+DEST_OFFSET = 3
+BYTES = [bytes((i,)) for i in range(256)] # one-byte probe payloads, built once instead of per packet
+MTU = 1472 # largest datagram we send- what fits a 1500-byte Ethernet frame after the IP and UDP headers
+MAX_PAYLOAD = MTU - DATA_HEADER.size
+DV_PER_FRAGMENT = (MTU - DV_HEADER.size) // DV_ENTRY.size # DV entries that fit one datagram- bigger tables are split
+
+# whole-packet formats for DV packets, one per entry count seen, so a table is packed in a single call
+_dv_structs = {}
+
+def dv_struct(k):
+    fmt = _dv_structs.get(k)
+    if fmt is None:
+        if len(_dv_structs) >= 64:
+            _dv_structs.clear()
+        fmt = _dv_structs[k] = struct.Struct(DV_HEADER.format + "Hf" * k)
+    return fmt
+
+_new = object.__new__
 
 class Packet():
-    PROBE, ACK, START, DV = range(4)
+    PROBE, ACK, START, DV, SR_PROBE, DATA, SR_DATA, DV_ACK, DV_REQUEST = range(9) # SR_*: from a selective-repeat sender, acked one packet at a time
+    EMPTY = (ACK, START, DV_ACK, DV_REQUEST) # header only- DV_ACK acks the DV version in seq_num, DV_REQUEST asks for the whole table
 
-    def __init__(self, source_port, dest_port, seq_num, packet_type, data=None):
+    # no per-instance dict- packets are created and thrown away for every datagram
+    __slots__ = ("source_port", "dest_port", "seq_num", "packet_type", "data", "dv_entries", "base", "frag", "frags")
+
+    # DV packets carry the sender's table version in seq_num and, in base, the version the entries are a delta
+    # against- base 0 means the whole table. A table too big for one datagram goes out as frags fragments of
+    # the same version, frag being this one's index
+    def __init__(self, source_port, dest_port, seq_num, packet_type, data=None, base=0, frag=0, frags=1):
         self.source_port = int(source_port)
         self.dest_port = int(dest_port)
         self.seq_num = int(seq_num)
-        self.packet_type = packet_type # 0 for probe, 1 for ACK, 2 for start, 3 for DV
-        if packet_type == Packet.PROBE:
+        self.packet_type = packet_type # 0 for probe, 1 for ACK, 2 for start, 3 for DV, 4 for selective-repeat probe, 5/6 for data, 7/8 for DV ack/request
+        self.dv_entries = None
+        self.base = int(base)
+        self.frag = int(frag)
+        self.frags = int(frags)
+        if packet_type == Packet.PROBE or packet_type == Packet.SR_PROBE:
             # if data is a string encode it
             if isinstance(data, str):
-                if len(data) != 1:
-                    raise ValueError("Probe packet data must be a single character")
-                self.data = data.encode()
-
+                data = data.encode()
             # if data already in bytes keep it the same
-            elif isinstance(data, bytes):
-                if len(data) != 1:
-                    raise ValueError("Probe packet data must be a single character")
-                self.data = data
-
-            else:
+            elif not isinstance(data, bytes):
                 raise ValueError(f"invalid data type for probe packet: {type(data)}")
+            if len(data) != 1:
+                raise ValueError("Probe packet data must be a single character")
+            self.data = data
+
+        # stream data- up to MAX_PAYLOAD bytes, an empty payload marks the end of the stream
+        elif packet_type == Packet.DATA or packet_type == Packet.SR_DATA:
+            if not isinstance(data, (bytes, bytearray)):
+                raise ValueError(f"invalid data type for data packet: {type(data)}")
+            if len(data) > MAX_PAYLOAD:
+                raise ValueError(f"Data packet payload too long: {len(data)} > {MAX_PAYLOAD} bytes")
+            self.data = data
 
         # data field empty for ACK packets
-        elif self.packet_type == Packet.ACK or self.packet_type == Packet.START:
+        elif packet_type in Packet.EMPTY:
             self.data = None
 
-        elif self.packet_type == Packet.DV:  # DV
+        elif packet_type == Packet.DV:  # DV
             # data is a dict mapping dest_port to cost
             if not isinstance(data, dict):
                 raise ValueError("DV packet needs dict {destPort: cost}")
             self.dv_entries = data
             self.data = None
-            self.dv_time = time.time()
 
         else:
             raise ValueError(f"invalid packet type: {packet_type}")
 
+    # build a decoded packet without going through the checks in __init__ again
+    @staticmethod
+    def _make(packet_type, source_port, dest_port, seq_num, data=None, dv_entries=None, base=0, frag=0, frags=1):
+        pkt = _new(Packet)
+        pkt.packet_type = packet_type
+        pkt.source_port = source_port
+        pkt.dest_port = dest_port
+        pkt.seq_num = seq_num
+        pkt.data = data
+        pkt.dv_entries = dv_entries
+        pkt.base = base
+        pkt.frag = frag
+        pkt.frags = frags
+        return pkt
+
+    # number of bytes the packet takes on the wire
+    def size(self):
+        if self.packet_type == Packet.DV:
+            return DV_HEADER.size + DV_ENTRY.size * len(self.dv_entries)
+        if self.packet_type == Packet.DATA or self.packet_type == Packet.SR_DATA:
+            return DATA_HEADER.size + len(self.data)
+        return HEADER.size
+
+    # write the packet into a caller-owned buffer at offset, returns the offset just past it
+    def pack_into(self, buffer, offset=0):
+        if self.packet_type == Packet.DV:
+            entries = self.dv_entries
+            fmt = dv_struct(len(entries))
+            fmt.pack_into(buffer, offset, Packet.DV, self.source_port, self.dest_port, self.seq_num, self.base, self.frag, self.frags, len(entries), *chain.from_iterable(entries.items()))
+            return offset + fmt.size
+        if self.packet_type == Packet.DATA or self.packet_type == Packet.SR_DATA:
+            n = len(self.data)
+            DATA_HEADER.pack_into(buffer, offset, self.packet_type, self.source_port, self.dest_port, self.seq_num, n)
+            offset += DATA_HEADER.size
+            buffer[offset:offset + n] = self.data
+            return offset + n
+        # add data if it's a probe packet, ACK and start packets have no data
+        data_val = self.data[0] if self.data else 0
+        HEADER.pack_into(buffer, offset, self.packet_type, self.source_port, self.dest_port, self.seq_num, data_val)
+        return offset + HEADER.size
+
     def packet_to_bytes(self):
-        # >: big endian
-        # h: short = 16 bits ==> 2 bytes
-        # i: int = 32 bits ==> 4 bytes
-        # b: char = 8 bits ==> 1 byte
-        # caps = unsigned
-
-        # add data if it's a probe packet
-        if self.packet_type == Packet.PROBE:
-            data_val = self.data[0] if self.data else 0
-            header = struct.pack(">BHHIB", self.packet_type, self.source_port, self.dest_port, self.seq_num, data_val)
-            return header
-
-        if self.packet_type == Packet.ACK or self.packet_type == Packet.START:  # ACK or START
-            return struct.pack(">BHHIB", self.packet_type, self.source_port,  self.dest_port, self.seq_num, 0)
-        
-        if self.packet_type == Packet.DV:  # DV
+        if self.packet_type == Packet.DV:
             entries = self.dv_entries
-            k = len(entries)
-            header = struct.pack( ">BHHH", Packet.DV, self.source_port, self.dest_port, k)
-            payload = b"".join(struct.pack(">Hf", dest, cost)
-                for dest, cost in entries.items()
-            )
-
-            return header + payload
-        # ACK and start packets have no data
-        header = struct.pack(">BHHIB", self.packet_type, self.source_port, self.dest_port, self.seq_num, 0)
-        return header
-
-    def bytes_to_packet(data_bytes): 
-        ptype = data_bytes[0]
-        if ptype == Packet.DV:  # DV
-            _, src, dst, k = struct.unpack(
-                ">BHHH", data_bytes[:7]
-            )
-            entries = {}
-            off = 7
-            for _ in range(k):
-                dest, cost = struct.unpack(
-                    ">Hf", data_bytes[off:off+6]
-                )
-                entries[dest] = cost
-                off += 6
-            pkt = Packet(src, dst, 0, Packet.DV, entries)
-            return pkt
-
-        if len(data_bytes) != 10:
+            return dv_struct(len(entries)).pack(Packet.DV, self.source_port, self.dest_port, self.seq_num, self.base, self.frag, self.frags, len(entries), *chain.from_iterable(entries.items()))
+        if self.packet_type == Packet.DATA or self.packet_type == Packet.SR_DATA:
+            return DATA_HEADER.pack(self.packet_type, self.source_port, self.dest_port, self.seq_num, len(self.data)) + self.data
+        data_val = self.data[0] if self.data else 0
+        return HEADER.pack(self.packet_type, self.source_port, self.dest_port, self.seq_num, data_val)
+
+    # point an already packed packet at another destination in place- lets one encoded DV go to every neighbor
+    @staticmethod
+    def readdress(buffer, dest_port, offset=0):
+        DEST_PORT.pack_into(buffer, offset + DEST_OFFSET, dest_port)
+
+    # decode straight out of the received buffer (bytes, bytearray or memoryview)- the DV entries are read
+    # through a memoryview so they are not copied out one slice at a time
+    @staticmethod
+    def bytes_to_packet(data_bytes):
+        if not len(data_bytes):
+            raise ValueError("Invalid packet length: 0 bytes")
+        if data_bytes[0] == Packet.DV:  # DV
+            if len(data_bytes) < DV_HEADER.size:
+                raise ValueError(f"Invalid DV packet length: {len(data_bytes)} bytes")
+            _, src, dst, version, base, frag, frags, k = DV_HEADER.unpack_from(data_bytes)
+            end = DV_HEADER.size + DV_ENTRY.size * k
+            if len(data_bytes) < end:
+                raise ValueError(f"DV packet truncated: {len(data_bytes)} of {end} bytes")
+            entries = dict(DV_ENTRY.iter_unpack(memoryview(data_bytes)[DV_HEADER.size:end]))
+            return Packet._make(Packet.DV, src, dst, version, None, entries, base, frag, frags)
+
+        if data_bytes[0] == Packet.DATA or data_bytes[0] == Packet.SR_DATA:
+            if len(data_bytes) < DATA_HEADER.size:
+                raise ValueError(f"Invalid data packet length: {len(data_bytes)} bytes")
+            packet_type, src, dst, seq_num, n = DATA_HEADER.unpack_from(data_bytes)
+            if len(data_bytes) != DATA_HEADER.size + n:
+                raise ValueError(f"Data packet length mismatch: {len(data_bytes)} bytes for a {n}-byte payload")
+            # the payload is copied out- the receive buffer is reused for the next datagram
+            return Packet._make(packet_type, src, dst, seq_num, bytes(memoryview(data_bytes)[DATA_HEADER.size:]))
+
+        if len(data_bytes) != HEADER.size:
             raise ValueError(f"Invalid packet length: {len(data_bytes)} bytes")
 
-        packet_type, source_port, dest_port, seq_num, data_val = struct.unpack(">BHHIB", data_bytes)
+        packet_type, source_port, dest_port, seq_num, data_val = HEADER.unpack_from(data_bytes)
 
         # check packet types ==> if probe -> add data, if ack -> return
-        if packet_type == Packet.PROBE:
-            data = bytes([data_val])
-            return Packet(source_port, dest_port, seq_num, Packet.PROBE, data)
-        elif packet_type == Packet.ACK:
-            return Packet(source_port, dest_port, seq_num, Packet.ACK, None)
-        elif packet_type == Packet.START:
-            return Packet(source_port, dest_port, seq_num, Packet.START, None)
+        if packet_type == Packet.PROBE or packet_type == Packet.SR_PROBE:
+            return Packet._make(packet_type, source_port, dest_port, seq_num, BYTES[data_val])
+        elif packet_type in Packet.EMPTY:
+            return Packet._make(packet_type, source_port, dest_port, seq_num)
         else:
-            raise ValueError(f"unknown packet type: {packet_type}")
\ No newline at end of file
+            raise ValueError(f"unknown packet type: {packet_type}")
@@ -0,0 +1,141 @@
+from array import array
+from itertools import compress, repeat
+from operator import add, ne
+
+INFINITY = 16.0   # cost of an unreachable destination- each link costs at most 1, so 16 lossy hops, as in RIP
+SHIFT = 10        # low bits of a key hold the neighbor index...
+MAX_NEIGHBORS = 1 << SHIFT
+INF = int(INFINITY * 100) # ...the rest the cost in hundredths, the precision costs are rounded to anyway
+UNREACHABLE = INF << SHIFT
+
+# cost in hundredths, capped at unreachable
+def hundredths(cost):
+    return min(int(round(cost * 100)), INF)
+
+# The latest vector of every neighbor as array('q') rows indexed by a destination id map. A key is a cost in
+# hundredths shifted left by SHIFT with a neighbor index in the low bits, so it sorts by cost and still says which
+# neighbor it came through. Each neighbor has a row of the costs it advertised and a row with its link cost and
+# index already added in (rebuilt only when the link cost moves), so best cost and next hop for every
+# destination are a single min over the keyed rows, column by column, run by map() in C- no Python-level loop
+# over destinations. A delta only moves the columns it names, so after deltas alone only those are recomputed
+class NeighborMatrix():
+    def __init__(self, my_port):
+        self.my_port = my_port
+        self.ids = {}      # dest port -> column
+        self.ports = []    # column -> dest port
+        self.nbrs = []     # row -> neighbor port
+        self.index = {}    # neighbor port -> row
+        self.advertised = [] # row -> advertised costs, as hundredths << SHIFT
+        self.keyed = []    # row -> advertised costs plus (link << SHIFT | row)
+        self.links = []    # row -> link cost in hundredths
+        self.best = array('q')
+        self.dirty = set() # columns touched by deltas since the last recompute, None for all of them
+
+    def _column(self, dest):
+        col = self.ids.get(dest)
+        if col is None:
+            col = self.ids[dest] = len(self.ports)
+            self.ports.append(dest)
+            for i, row in enumerate(self.advertised):
+                row.append(UNREACHABLE)
+                self.keyed[i].append(UNREACHABLE + self._offset(i))
+            self.best.append(UNREACHABLE)
+            self._touch(col)
+        return col
+
+    def _touch(self, col):
+        if self.dirty is not None:
+            self.dirty.add(col)
+
+    def _offset(self, i):
+        return (self.links[i] << SHIFT) | i
+
+    def add_neighbor(self, nbr, link_cost=0.0):
+        if nbr in self.index:
+            return
+        if len(self.nbrs) >= MAX_NEIGHBORS:
+            raise ValueError(f"at most {MAX_NEIGHBORS} neighbors")
+        i = self.index[nbr] = len(self.nbrs)
+        self.nbrs.append(nbr)
+        self.links.append(hundredths(link_cost))
+        self.advertised.append(array('q', repeat(UNREACHABLE, len(self.ports))))
+        self.keyed.append(array('q', repeat(UNREACHABLE + self._offset(i), len(self.ports))))
+        self._set(i, self._column(nbr), 0) # a neighbor is zero past itself
+        self.dirty = None
+
+    def _set(self, i, col, value):
+        self.advertised[i][col] = value
+        self.keyed[i][col] = value + self._offset(i)
+
+    def set_link(self, nbr, cost):
+        i = self.index[nbr]
+        self.links[i] = hundredths(cost)
+        self.keyed[i] = array('q', map(add, self.advertised[i], repeat(self._offset(i))))
+        self.dirty = None
+
+    # merge advertised {dest: cost} entries into the neighbor's rows- with whole set they replace them
+    def update(self, nbr, entries, whole=False):
+        i = self.index[nbr]
+        if whole:
+            n = len(self.ports)
+            self.advertised[i] = array('q', repeat(UNREACHABLE, n))
+            self.keyed[i] = array('q', repeat(UNREACHABLE + self._offset(i), n))
+            self.dirty = None
+        advertised = self.advertised[i]
+        keyed = self.keyed[i]
+        offset = self._offset(i)
+        for dest, cost in entries.items():
+            if dest != self.my_port:
+                col = self._column(dest)
+                value = hundredths(cost) << SHIFT
+                advertised[col] = value
+                keyed[col] = value + offset
+                self._touch(col)
+        self._set(i, self.ids[nbr], 0)
+
+    # cost of reaching dest through neighbor nbr, INFINITY when that neighbor offers no route to it
+    def cost_via(self, nbr, dest):
+        i = self.index.get(nbr)
+        col = self.ids.get(dest)
+        if i is None or col is None:
+            return INFINITY
+        key = self.keyed[i][col]
+        return INFINITY if key >= UNREACHABLE else (key >> SHIFT) / 100
+
+    # best (cost, next hop) to dest right now, (INFINITY, None) when no neighbor offers one
+    def route(self, dest):
+        col = self.ids.get(dest)
+        if col is None or not self.keyed:
+            return INFINITY, None
+        key = min([row[col] for row in self.keyed])
+        if key >= UNREACHABLE:
+            return INFINITY, None
+        return (key >> SHIFT) / 100, self.nbrs[key & (MAX_NEIGHBORS - 1)]
+
+    # recompute every destination at once, returns [(dest, cost, next hop)] for the ones whose route changed-
+    # an unreachable destination comes back as (dest, INFINITY, None). Equal costs go to the lower neighbor row
+    def recompute(self):
+        if not self.keyed:
+            return []
+        # a delta touching much of the table is cheaper to redo in one pass than column by column
+        if self.dirty is None or len(self.dirty) > len(self.best) // 8:
+            best = array('q', map(min, *self.keyed)) if len(self.keyed) > 1 else array('q', self.keyed[0])
+            changed = compress(range(len(best)), map(ne, best, self.best))
+            self.best = best
+        else:
+            best = self.best
+            changed = []
+            for col in sorted(self.dirty):
+                key = min([row[col] for row in self.keyed])
+                if key != best[col]:
+                    best[col] = key
+                    changed.append(col)
+        self.dirty = set()
+        out = []
+        for col in changed:
+            key = best[col]
+            if key >= UNREACHABLE:
+                out.append((self.ports[col], INFINITY, None))
+            else:
+                out.append((self.ports[col], (key >> SHIFT) / 100, self.nbrs[key & (MAX_NEIGHBORS - 1)]))
+        return out
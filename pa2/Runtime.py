@@ -0,0 +1,152 @@
+import heapq
+import itertools
+import selectors
+import time
+from socket import *
+
+RECV_BUFSIZE = 65536 # largest UDP datagram, so nothing read off the socket is ever cut short
+RECV_BATCH = 64     # datagrams read per wakeup before the loop gets to run timers again
+
+# A node only needs two things from its runtime: a loop (time(), wall(), call_at(), call_later()) and a transport
+# (send(data, port), reply(data, addr), handing every datagram it receives to on_datagram(data, addr)). The real
+# pair is EventLoop + UdpTransport; Emulator.py has a virtual pair that runs many nodes in one process
+
+# one callback scheduled on the loop- cancel() only marks it, the loop drops it when it comes up
+class Timer():
+    __slots__ = ("when", "callback", "args", "cancelled")
+
+    def __init__(self, when, callback, args):
+        self.when = when
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+# the timer heap both loops share
+class TimerQueue():
+    def __init__(self):
+        self.timers = []               # heap of (when, tie breaker, Timer)
+        self.counter = itertools.count()
+        self.running = False
+
+    def call_at(self, when, callback, *args):
+        timer = Timer(when, callback, args)
+        heapq.heappush(self.timers, (when, next(self.counter), timer))
+        return timer
+
+    def call_later(self, delay, callback, *args):
+        return self.call_at(self.time() + delay, callback, *args)
+
+    def stop(self):
+        self.running = False
+
+    # when the next live timer is due, None if there is none
+    def _next_due(self):
+        timers = self.timers
+        while timers and timers[0][2].cancelled:
+            heapq.heappop(timers)
+        return timers[0][0] if timers else None
+
+# single-threaded event loop: one selector waits on every socket and the earliest timer says how long it may wait,
+# so nothing ever blocks on a socket by itself. Several nodes can share one loop (and one process)
+class EventLoop(TimerQueue):
+    def __init__(self):
+        super().__init__()
+        self.selector = selectors.DefaultSelector()
+
+    def time(self):
+        return time.monotonic() # steady clock- timer deadlines and RTT samples must not jump with the wall clock
+
+    def wall(self):
+        return time.time() # for log timestamps only- they should read as the time of day
+
+    # callback(sock) runs whenever sock has something to read
+    def add_reader(self, sock, callback):
+        sock.setblocking(False)
+        self.selector.register(sock, selectors.EVENT_READ, callback)
+
+    def remove_reader(self, sock):
+        self.selector.unregister(sock)
+
+    def _run_timers(self):
+        timers = self.timers
+        now = self.time()
+        while timers and timers[0][0] <= now:
+            timer = heapq.heappop(timers)[2]
+            if not timer.cancelled:
+                timer.callback(*timer.args)
+
+    def run_forever(self):
+        self.running = True
+        while self.running:
+            due = self._next_due()
+            for key, _ in self.selector.select(None if due is None else max(0.0, due - self.time())):
+                key.data(key.fileobj)
+            self._run_timers()
+
+# discrete-event loop on a virtual clock: time jumps straight to the next timer, so a run takes as long as its
+# callbacks do, not as long as the time it covers
+class VirtualLoop(TimerQueue):
+    def __init__(self, start=0.0):
+        super().__init__()
+        self.now = start
+        self.events = 0 # callbacks run so far
+
+    def time(self):
+        return self.now
+
+    def wall(self):
+        return self.now # logs of a virtual run are stamped in virtual time
+
+    # run timers in time order until `until` (virtual seconds), stop() or nothing is left to run
+    def run(self, until=None):
+        self.running = True
+        timers = self.timers
+        while self.running:
+            due = self._next_due()
+            if due is None or (until is not None and due > until):
+                break
+            timer = heapq.heappop(timers)[2]
+            self.now = max(self.now, due)
+            self.events += 1
+            timer.callback(*timer.args)
+        if until is not None and self.running:
+            self.now = max(self.now, until)
+
+# one UDP socket bound to the node's port and read by an EventLoop
+class UdpTransport():
+    def __init__(self, loop, ip, port, on_datagram):
+        self.ip = ip
+        self.on_datagram = on_datagram
+        self.udp_socket = socket(AF_INET, SOCK_DGRAM)
+        self.udp_socket.bind(('0.0.0.0', port))
+        # one receive buffer, reused for every datagram and decoded in place
+        self.buffer = bytearray(RECV_BUFSIZE)
+        self.view = memoryview(self.buffer)
+        loop.add_reader(self.udp_socket, self._on_readable)
+
+    def send(self, data, port):
+        try:
+            self.udp_socket.sendto(data, (self.ip, port))
+        except BlockingIOError:
+            pass # socket buffer full- same as a drop on the link, the retransmission timer covers it
+
+    def reply(self, data, addr):
+        try:
+            self.udp_socket.sendto(data, addr)
+        except BlockingIOError:
+            pass
+
+    # read whatever is queued on the socket and hand each datagram on
+    def _on_readable(self, sock):
+        for _ in range(RECV_BATCH):
+            try:
+                nbytes, client_address = sock.recvfrom_into(self.buffer)
+            except BlockingIOError:
+                return
+            except OSError as e: # e.g. ICMP port unreachable from a neighbor that is not up yet
+                print(f"[{sock.getsockname()[1]}] socket error: {e}")
+                continue
+            self.on_datagram(self.view[:nbytes], client_address)
@@ -0,0 +1,327 @@
+from Congestion import CongestionWindow, RttEstimator
+from Packet import MAX_PAYLOAD, Packet
+
+RECV_WINDOW = 64 # out-of-order packets a selective-repeat receiver holds on to per sender- also the largest cwnd
+
+# per-peer protocol state machines. None of them touch a socket or sleep- the node's event loop hands them the
+# packets for their peer and runs their timers, and they send through node.send_to(data, port) / node.reply(data, addr)
+
+# cut a byte source into payloads of at most size bytes- source is a bytes-like object, a binary file, or any
+# iterable of byte strings (re-cut, so its pieces do not have to be payload sized)
+def chunked(source, size=MAX_PAYLOAD):
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        view = memoryview(source)
+        for i in range(0, len(view), size):
+            yield bytes(view[i:i + size])
+        return
+    if hasattr(source, "read"):
+        while True:
+            block = source.read(size)
+            if not block:
+                return
+            yield block
+    pending = bytearray()
+    for piece in source:
+        pending += piece
+        while len(pending) >= size:
+            yield bytes(pending[:size])
+            del pending[:size]
+    if pending:
+        yield bytes(pending)
+
+# default sink for received streams- keeps only the byte count
+class CountingSink():
+    def __init__(self):
+        self.nbytes = 0
+
+    def write(self, data):
+        self.nbytes += len(data)
+
+    def close(self):
+        pass
+
+# go-back-N sender: one timer for the oldest unACK'd packet, a timeout resends everything from there.
+# Sends either the one-character probe message or, with stream set, a byte source as DATA packets ended by an
+# empty one. Payloads are pulled from the source only as the window opens and kept until they are ACK'd
+class GbnSender():
+    PROBE_TYPE = Packet.PROBE
+    DATA_TYPE = Packet.DATA
+
+    def __init__(self, node, dest_port, source, stream=False):
+        self.node = node
+        self.loop = node.loop
+        self.dest_port = dest_port
+        self.stream = stream
+        self.packet_type = self.DATA_TYPE if stream else self.PROBE_TYPE
+        self.chunks = iter(chunked(source) if stream else source)
+        self.unacked = {}      # seq -> payload of every packet sent and not ACK'd yet
+        self.total = None      # packets in the transfer, known once the source runs dry
+        self.nbytes = 0
+        self.rtt = RttEstimator()
+        self.cc = CongestionWindow(node.window_size)
+        self.next_seq_num = 0
+        self.window_idx = 0
+        self.highest_sent = -1 # anything at or below this was sent before, so sending it again is a retransmission
+        self.sent_at = {}      # seq -> send time, only for packets sent exactly once (Karn's rule)
+        self.resent = 0
+        self.timer = None
+        self.start_time = None
+        self.done = False
+
+    def start(self):
+        self.start_time = self.loop.time()
+        self.node._trace(self.dest_port, "start", self.cc, self.rtt)
+        print(f"Trying to connect to port {self.dest_port}")
+        self._fill()
+
+    # payload of packet seq, pulled from the source the first time- None once seq is past the end
+    def _payload(self, seq):
+        payload = self.unacked.get(seq)
+        if payload is None and self.total is None:
+            try:
+                payload = next(self.chunks)
+                self.nbytes += len(payload)
+            except StopIteration:
+                if not self.stream:
+                    self.total = seq
+                    return None
+                payload = b"" # end of stream
+                self.total = seq + 1
+            self.unacked[seq] = payload
+        return payload
+
+    def _transmit(self, seq, payload):
+        packet = Packet(self.node.my_port, self.dest_port, seq, self.packet_type, payload)
+        self.node.send_to(packet.packet_to_bytes(), self.dest_port)
+        self.node.sent_cnt[self.dest_port] += 1
+
+    def _show(self, payload):
+        return f"bytes={len(payload)}" if self.stream else f"data={payload}"
+
+    # send packets within the congestion window
+    def _fill(self):
+        while self.next_seq_num < self.window_idx + self.cc.window():
+            seq = self.next_seq_num
+            payload = self._payload(seq)
+            if payload is None:
+                break
+            self._transmit(seq, payload)
+            if seq <= self.highest_sent:
+                self.resent += 1
+                self.node.lost_cnt[self.dest_port] += 1
+                self.sent_at.pop(seq, None)
+                print(f"resent packet {seq}")
+            else:
+                self.highest_sent = seq
+                self.sent_at[seq] = self.loop.time()
+                print(f"sending packet {seq}, {self._show(payload)}")
+            self.next_seq_num = seq + 1
+        if self.window_idx == self.total:
+            self._finish() # nothing to send at all
+        # start timer if not active and if there are unACK'd packets
+        elif self.timer is None and self.window_idx < self.next_seq_num:
+            self.timer = self.loop.call_later(self.rtt.timeout(), self._on_timeout)
+
+    def _stop_timer(self):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+
+    def on_ack(self, packet):
+        if self.done or packet.seq_num < self.window_idx or packet.seq_num > self.highest_sent:
+            return
+        if packet.seq_num in self.sent_at:
+            self.rtt.sample(self.loop.time() - self.sent_at[packet.seq_num])
+        for seq in range(self.window_idx, packet.seq_num + 1):
+            self.sent_at.pop(seq, None)
+            self.unacked.pop(seq, None)
+        self.cc.on_ack(packet.seq_num + 1 - self.window_idx) # cumulative- one ACK can cover several packets
+        self.window_idx = packet.seq_num + 1
+        self.next_seq_num = max(self.next_seq_num, self.window_idx)
+        self.node._trace(self.dest_port, "ack", self.cc, self.rtt)
+        print(f"received ACK {packet.seq_num}, window idx now {self.window_idx}, cwnd {self.cc.cwnd:.2f}")
+
+        # restart the timer for whatever is still unACK'd
+        self._stop_timer()
+        self._fill()
+
+    def _on_timeout(self):
+        # back off the timer, shrink the window and go back to the oldest unACK'd packet-
+        # _fill resends as much of the old window as the new cwnd allows
+        self.timer = None
+        self.rtt.on_timeout()
+        self.cc.on_loss()
+        self.node._trace(self.dest_port, "timeout", self.cc, self.rtt)
+        print(f"timeout at window idx: {self.window_idx}, going back, cwnd {self.cc.cwnd:.2f}, rto {self.rtt.timeout():.3f}s")
+        self.next_seq_num = self.window_idx
+        self._fill()
+
+    def _finish(self):
+        if self.done:
+            return
+        self._stop_timer()
+        self.done = True
+        elapsed = self.loop.time() - self.start_time
+        self.node._sender_done(self.dest_port, self.total + self.resent, self.resent, self.nbytes, elapsed)
+
+# selective repeat: every packet in the window has its own timer and only packets whose timer runs out are resent
+class SrSender(GbnSender):
+    PROBE_TYPE = Packet.SR_PROBE
+    DATA_TYPE = Packet.SR_DATA
+
+    def __init__(self, node, dest_port, source, stream=False):
+        super().__init__(node, dest_port, source, stream)
+        self.timers = {}        # seq -> Timer, for every unACK'd packet in the window
+        self.resent_seqs = set() # unACK'd packets sent more than once- their ACKs give no RTT sample
+        self.acked = set()      # ACK'd packets above the base (window_idx)
+        self.expired = []       # timers that ran out this loop iteration, resent together
+
+    def start(self):
+        self.start_time = self.loop.time()
+        self.node._trace(self.dest_port, "start", self.cc, self.rtt)
+        print(f"Trying to connect to port {self.dest_port} (selective repeat)")
+        self._fill()
+
+    def _fill(self):
+        while self.next_seq_num < self.window_idx + self.cc.window():
+            seq = self.next_seq_num
+            payload = self._payload(seq)
+            if payload is None:
+                break
+            self._transmit(seq, payload)
+            self._arm(seq)
+            print(f"sending packet {seq}, {self._show(payload)}")
+            self.next_seq_num = seq + 1
+        if self.window_idx == self.total:
+            self._finish()
+
+    def _arm(self, seq):
+        now = self.loop.time()
+        self.sent_at[seq] = now
+        self.timers[seq] = self.loop.call_at(now + self.rtt.timeout(), self._on_packet_timeout, seq)
+
+    def on_ack(self, packet):
+        seq = packet.seq_num
+        if self.done or seq not in self.timers:
+            return
+        if seq in self.resent_seqs:
+            self.resent_seqs.discard(seq)
+        else:
+            self.rtt.sample(self.loop.time() - self.sent_at[seq])
+        self.timers.pop(seq).cancel()
+        del self.sent_at[seq]
+        del self.unacked[seq]
+        self.acked.add(seq)
+        self.cc.on_ack()
+        self.node._trace(self.dest_port, "ack", self.cc, self.rtt)
+        print(f"received ACK {seq}, cwnd {self.cc.cwnd:.2f}")
+        while self.window_idx in self.acked:
+            self.acked.discard(self.window_idx)
+            self.window_idx += 1
+        self._fill()
+
+    # timers that expire together are gathered first so the loss reaction happens once per batch
+    def _on_packet_timeout(self, seq):
+        if not self.expired:
+            self.loop.call_later(0, self._resend_expired)
+        self.expired.append(seq)
+
+    def _resend_expired(self):
+        expired = [seq for seq in self.expired if seq in self.timers]
+        self.expired = []
+        if not expired or self.done:
+            return
+        self.rtt.on_timeout()
+        self.cc.on_loss()
+        self.node._trace(self.dest_port, "timeout", self.cc, self.rtt)
+        for seq in expired:
+            self._transmit(seq, self.unacked[seq])
+            self._arm(seq)
+            self.resent_seqs.add(seq)
+            self.resent += 1
+            self.node.lost_cnt[self.dest_port] += 1
+            print(f"timeout on packet {seq}, resent it, cwnd {self.cc.cwnd:.2f}, rto {self.rtt.timeout():.3f}s")
+
+    def _finish(self):
+        for timer in self.timers.values():
+            timer.cancel()
+        self.timers.clear()
+        super()._finish()
+
+# receiving side for one sending peer- drops its packets with probability p, then delivers in order. Go-back-N
+# packets are ACK'd cumulatively and anything out of order is discarded; selective-repeat packets inside the
+# window are held until the gap fills and every one is ACK'd on its own. Probe characters are printed, stream
+# data is written to a sink from node.open_sink(src_port) until the empty end-of-stream packet
+class PeerReceiver():
+    def __init__(self, node, src_port, p):
+        self.node = node
+        self.src_port = src_port
+        self.p = p
+        self.expected_seq_num = 0 # next seq to deliver
+        self.held = {}            # seq -> packet held out of order (selective repeat only)
+        self.dropped = 0
+        self.sink = None
+        self.nbytes = 0
+        self.first_at = None      # arrival of the first data packet
+        self.finished = False
+
+    def _drop(self, packet):
+        if self.node.rng.random() < self.p:
+            self.dropped += 1
+            print(f"[recv:{self.src_port}] dropped seq={packet.seq_num}")
+            return True
+        return False
+
+    def _ack(self, seq, addr):
+        self.node.reply(Packet(self.node.my_port, self.src_port, seq, Packet.ACK).packet_to_bytes(), addr)
+
+    def _deliver(self, packet):
+        kind = packet.packet_type
+        if kind == Packet.PROBE or kind == Packet.SR_PROBE:
+            print(f"[recv:{self.src_port}] {packet.data.decode()} (seq num: {packet.seq_num})")
+            return
+        if packet.data:
+            if self.sink is None:
+                self.sink = self.node.open_sink(self.src_port)
+            self.sink.write(packet.data)
+            self.nbytes += len(packet.data)
+            print(f"[recv:{self.src_port}] {len(packet.data)} bytes (seq num: {packet.seq_num})")
+        elif not self.finished:
+            self.finished = True
+            if self.sink is not None:
+                self.sink.close()
+            self.node._stream_done(self.src_port, self.nbytes, packet.seq_num, self.node.loop.time() - self.first_at)
+
+    def _arrived(self, packet):
+        if self.first_at is None and packet.packet_type in (Packet.DATA, Packet.SR_DATA):
+            self.first_at = self.node.loop.time()
+
+    def on_gbn(self, packet, addr):
+        if self._drop(packet):
+            return
+        self._arrived(packet)
+        # if we get the correct seq num ACK it, otherwise resend ACK of last ACK'd packet
+        if packet.seq_num == self.expected_seq_num:
+            self._deliver(packet)
+            self._ack(packet.seq_num, addr)
+            self.expected_seq_num += 1
+        elif self.expected_seq_num > 0:
+            self._ack(self.expected_seq_num - 1, addr)
+            print(f"[recv:{self.src_port}] Out of order packet {packet.seq_num} sent re-ACK for {self.expected_seq_num - 1}")
+
+    def on_sr(self, packet, addr):
+        if self._drop(packet):
+            return
+        self._arrived(packet)
+        seq = packet.seq_num
+        if seq >= self.expected_seq_num + RECV_WINDOW:
+            return # beyond what we can hold, the sender will time out and resend it
+        if seq >= self.expected_seq_num:
+            self.held[seq] = packet
+            if seq != self.expected_seq_num:
+                print(f"[recv:{self.src_port}] Out of order packet {seq} buffered, waiting for {self.expected_seq_num}")
+            while self.expected_seq_num in self.held:
+                self._deliver(self.held.pop(self.expected_seq_num))
+                self.expected_seq_num += 1
+        # packets below the window were delivered already- their ACK got lost, so ACK them again
+        self._ack(seq, addr)
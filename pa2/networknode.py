@@ -1,18 +1,22 @@
+import os
 import sys
-import threading
-import time
 
-from Node import Node
+from Node import MODES, Node
+from Transport import chunked
 
 ip = "localhost"
 
 def process_input(argv):
 
     if len(argv) < 2:
-        print(f"Usage: {argv[0]} <my_port> [receive <ports>...] [send <ports>...]")
+        print(f"Usage: {argv[0]} <my_port> [receive <ports>...] [send <ports>...] [mode gbn|sr] [trace <file>] [file <path>] [save <dir>]")
         sys.exit(1)
 
     last_seen = False
+    mode = "gbn"
+    trace_file = None
+    stream_file = None
+    save_dir = None
     my_port = int(argv[1])
     send_ports = []
     recv_ports = []
@@ -36,45 +40,69 @@ def process_input(argv):
             if i < len(argv) and argv[i] == "last":
                 last_seen = True
                 i += 1
+        # transport used by this node's senders- go-back-N by default, or selective repeat
+        elif argv[i] == "mode":
+            if i + 1 < len(argv) and argv[i+1] in MODES:
+                mode = argv[i+1]
+            else:
+                print(f"Warning: mode must be one of {', '.join(MODES)}, keeping {mode}")
+            i += 2
+        # write the senders' cwnd/RTO trace to this CSV file once they are done
+        elif argv[i] == "trace":
+            if i + 1 < len(argv):
+                trace_file = argv[i+1]
+            i += 2
+        # stream this file to every send port instead of the probe message
+        elif argv[i] == "file":
+            if i + 1 < len(argv):
+                stream_file = argv[i+1]
+            i += 2
+        # write every stream received from a neighbor to <dir>/from_<port>.bin
+        elif argv[i] == "save":
+            if i + 1 < len(argv):
+                save_dir = argv[i+1]
+            i += 2
         else:
             print(f"Warning: unrecognized token '{argv[i]}', skipping")
             i += 1
 
-    return my_port, send_ports, recv_ports, last_seen
+    return my_port, send_ports, recv_ports, last_seen, mode, trace_file, stream_file, save_dir
+
+# read a file lazily in payload-sized pieces, closing it once it has all been read
+def file_source(path):
+    with open(path, "rb") as file:
+        yield from chunked(file)
 
 if __name__ == "__main__":
-    my_port, send_ports, recv_ports, last_seen = process_input(sys.argv)
+    my_port, send_ports, recv_ports, last_seen, mode, trace_file, stream_file, save_dir = process_input(sys.argv)
 
     print(f"my port is: {my_port}")
     print(f"send ports are: {send_ports}")
     print(f"recv ports are: {recv_ports}")
+    print(f"transport mode is: {mode}")
 
-    # create a different thread for each of the recievers
-    node = Node(ip, my_port, send_ports, recv_ports)
-
-    # start global receiver which won't recieve messages
-    # just here so that it will get the kick to start sending
-    t0 = threading.Thread(target=node.run_receiver, args=(my_port, 0), daemon=False, name=f"recv-{my_port}-GLOBAL")
-    t0.start()
-
-    # start receiver threads unconditionally
+    # one node, one socket and one event loop- every receiver and sender is a state machine on that loop
+    sink = None
+    if save_dir is not None:
+        os.makedirs(save_dir, exist_ok=True)
+        sink = lambda src_port: open(os.path.join(save_dir, f"from_{src_port}.bin"), "wb")
+    node = Node(ip, my_port, send_ports, recv_ports, mode=mode, sink=sink)
+    if stream_file is not None:
+        if not os.path.isfile(stream_file):
+            print(f"Error: no such file: {stream_file}")
+            sys.exit(1)
+        for port in send_ports:
+            node.send_stream(port, file_source(stream_file))
     for port, p in recv_ports:
-        # is not daemon thread so will always listen as long as program doesn't exit
-        t = threading.Thread(target=node.run_receiver, args=(port, p), daemon=False, name=f"recv-{my_port}-{port}")
-        t.start()
-        print(f"[{my_port}] Started recv-thread on port {port} (p={p})")
+        print(f"[{my_port}] receiving from port {port} (p={p})")
+
+    # write the trace once every sender is done, the node keeps running for DV after that
+    def senders_done(node):
+        if trace_file is not None:
+            node.write_trace(trace_file)
+            print(f"[{my_port}] cwnd/RTO trace written to {trace_file}")
 
-    # if not "last" node, wait for signal
+    # if not "last" node, the loop waits for the global START, otherwise it sends it after a second
     if not last_seen:
         print(f"[{my_port}] waiting for global START …")
-        node.start_event.wait()
-    else:
-        # sleep to make sure all receivers are running
-        time.sleep(1)
-        node.broadcast_start()
-        node.start_event.set()
-    
-    #once started fire senders*exactly once per neighbor
-    for port in send_ports:
-        #print(f"[{my_port}] Starting sender to port {port}")
-        node.run_sender(port)
\ No newline at end of file
+    node.run(last_seen, senders_done)
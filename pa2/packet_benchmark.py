@@ -0,0 +1,68 @@
+import argparse
+import struct
+import time
+
+from Packet import Packet
+
+# the codec as it was before the precompiled structs (on today's wire format)- kept here only as the baseline to compare against
+def legacy_to_bytes(pkt):
+    if pkt.packet_type == Packet.DV:
+        header = struct.pack(">BHHIIHHH", Packet.DV, pkt.source_port, pkt.dest_port, pkt.seq_num, pkt.base, pkt.frag, pkt.frags, len(pkt.dv_entries))
+        return header + b"".join(struct.pack(">Hf", dest, cost) for dest, cost in pkt.dv_entries.items())
+    data_val = pkt.data[0] if pkt.data else 0
+    return struct.pack(">BHHIB", pkt.packet_type, pkt.source_port, pkt.dest_port, pkt.seq_num, data_val)
+
+def legacy_from_bytes(data_bytes):
+    if data_bytes[0] == Packet.DV:
+        _, src, dst, version, base, frag, frags, k = struct.unpack(">BHHIIHHH", data_bytes[:19])
+        entries = {}
+        off = 19
+        for _ in range(k):
+            dest, cost = struct.unpack(">Hf", data_bytes[off:off+6])
+            entries[dest] = cost
+            off += 6
+        return Packet(src, dst, version, Packet.DV, entries, base, frag, frags)
+    packet_type, source_port, dest_port, seq_num, data_val = struct.unpack(">BHHIB", data_bytes)
+    if packet_type == Packet.PROBE:
+        return Packet(source_port, dest_port, seq_num, Packet.PROBE, bytes([data_val]))
+    return Packet(source_port, dest_port, seq_num, packet_type, None)
+
+# time `count` calls of fn, returns calls per second
+def rate(fn, arg, count):
+    start = time.perf_counter()
+    for _ in range(count):
+        fn(arg)
+    return count / (time.perf_counter() - start)
+
+# encode with a buffer that is reused across calls, like the node's send path
+def make_packer(size):
+    buffer = bytearray(size)
+    return lambda pkt: pkt.pack_into(buffer)
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmark of the pa2 packet codec")
+    parser.add_argument("--count", type=int, default=200000, help="packets per measurement (divided by 100 for DV)")
+    parser.add_argument("--entries", type=int, default=1000, help="destinations in the large DV packet")
+    args = parser.parse_args()
+
+    cases = [
+        ("PROBE", Packet(1111, 2222, 7, Packet.PROBE, "h"), args.count),
+        ("ACK", Packet(2222, 1111, 7, Packet.ACK), args.count),
+        (f"DV x{args.entries}", Packet(1111, 2222, 0, Packet.DV, {1024 + i: i / 100 for i in range(args.entries)}), max(1, args.count // 100)),
+    ]
+    # encode = new bytes per packet, reuse = pack_into a buffer kept across packets (what the DV broadcast does)
+    print(f"{'packet':12s} {'op':7s} {'before pkt/s':>14s} {'after pkt/s':>14s} {'speedup':>8s}")
+    for name, pkt, count in cases:
+        wire = pkt.packet_to_bytes()
+        assert legacy_to_bytes(pkt) == wire
+        assert Packet.bytes_to_packet(wire).dv_entries == legacy_from_bytes(wire).dv_entries
+        ops = [("encode", legacy_to_bytes, Packet.packet_to_bytes, pkt)]
+        if pkt.packet_type == Packet.DV: # a 10-byte header is cheaper to build fresh than to pack into a buffer from Python
+            ops.append(("reuse", legacy_to_bytes, make_packer(pkt.size()), pkt))
+        ops.append(("decode", legacy_from_bytes, Packet.bytes_to_packet, wire))
+        for op, before, after, arg in ops:
+            old, new = rate(before, arg, count), rate(after, arg, count)
+            print(f"{name:12s} {op:7s} {old:14.0f} {new:14.0f} {new / old:7.1f}x")
+
+if __name__ == "__main__":
+    main()
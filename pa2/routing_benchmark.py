@@ -0,0 +1,92 @@
+import argparse
+import random
+import time
+
+from Routing import INFINITY, NeighborMatrix
+
+# the per-entry dict recompute the node used before the neighbor matrix- kept here only as the baseline
+def legacy_recompute(my_port, link_cost, vectors, table):
+    round2 = lambda x: round(x, 2)
+    best = {my_port: (0.0, my_port)}
+    for nbr in sorted(link_cost):
+        link = link_cost[nbr]
+        offers = [(nbr, link)]
+        offers.extend((dest, round2(link + cost)) for dest, cost in vectors[nbr].items())
+        for dest, cost in offers:
+            if dest == my_port or cost >= INFINITY:
+                continue
+            current = best.get(dest)
+            if current is None or cost + 1e-9 < current[0] or (abs(cost - current[0]) <= 1e-9 and table.get(dest, (0.0, None))[1] == nbr):
+                best[dest] = (cost, nbr)
+    return [(dest, route) for dest, route in best.items() if table.get(dest) != route]
+
+# a random topology as seen from one node: every neighbor advertises a cost to every destination
+def make_vectors(rng, nbrs, dests):
+    return {nbr: {dest: round(rng.uniform(0, 5), 2) for dest in dests} for nbr in nbrs}
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark of the routing-table recompute: dict loop vs neighbor matrix")
+    parser.add_argument("--dests", type=int, default=2000, help="destinations in every neighbor's vector")
+    parser.add_argument("--neighbors", type=int, default=8, help="neighbors of the node")
+    parser.add_argument("--changes", type=int, default=20, help="entries in each neighbor delta")
+    parser.add_argument("--rounds", type=int, default=50, help="recomputes timed per case, each after one delta or link change")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    my_port = 1
+    nbrs = list(range(2, 2 + args.neighbors))
+    dests = list(range(10000, 10000 + args.dests))
+    link_cost = {nbr: round(rng.uniform(0, 1), 2) for nbr in nbrs}
+    vectors = make_vectors(rng, nbrs, dests)
+    deltas = [(rng.choice(nbrs), {dest: round(rng.uniform(0, 5), 2) for dest in rng.sample(dests, args.changes)})
+              for _ in range(args.rounds)]
+
+    # neighbor matrix, loaded first while the vectors are still the starting ones
+    matrix = NeighborMatrix(my_port)
+    for nbr in nbrs:
+        matrix.add_neighbor(nbr, link_cost[nbr])
+        matrix.update(nbr, vectors[nbr], whole=True)
+    routes = {dest: (cost, hop) for dest, cost, hop in matrix.recompute()}
+    start = time.perf_counter()
+    for nbr, delta in deltas:
+        matrix.update(nbr, delta)
+        for dest, cost, hop in matrix.recompute():
+            routes[dest] = (cost, hop)
+    new = (time.perf_counter() - start) / args.rounds
+    # a link cost change moves every column, so this is the full min-reduction
+    links = [(rng.choice(nbrs), round(rng.uniform(0, 1), 2)) for _ in range(args.rounds)]
+    start = time.perf_counter()
+    for nbr, cost in links:
+        matrix.set_link(nbr, cost)
+        for dest, cost, hop in matrix.recompute():
+            routes[dest] = (cost, hop)
+    new_full = (time.perf_counter() - start) / args.rounds
+
+    # dict loop
+    table = {}
+    for dest, route in legacy_recompute(my_port, link_cost, vectors, table):
+        table[dest] = route
+    start = time.perf_counter()
+    for nbr, delta in deltas:
+        vectors[nbr].update(delta)
+        for dest, route in legacy_recompute(my_port, link_cost, vectors, table):
+            table[dest] = route
+    old = (time.perf_counter() - start) / args.rounds
+    start = time.perf_counter()
+    for nbr, cost in links:
+        link_cost[nbr] = cost
+        for dest, route in legacy_recompute(my_port, link_cost, vectors, table):
+            table[dest] = route
+    old_full = (time.perf_counter() - start) / args.rounds
+
+    # same costs either way (next hops can differ on ties)
+    mismatched = sum(1 for dest in dests if abs(routes[dest][0] - table[dest][0]) > 1e-6)
+    print(f"{args.dests} destinations, {args.neighbors} neighbors, {args.rounds} deltas of {args.changes} entries "
+          f"({mismatched} cost mismatches)")
+    print(f"{'':12s} {'dict loop ms':>13s} {'matrix ms':>10s} {'speedup':>8s}")
+    print(f"{'delta':12s} {old * 1000:13.3f} {new * 1000:10.3f} {old / new:7.1f}x")
+    print(f"{'link change':12s} {old_full * 1000:13.3f} {new_full * 1000:10.3f} {old_full / new_full:7.1f}x")
+
+if __name__ == "__main__":
+    main()